@@ -1,80 +1,206 @@
-from flask import Flask, render_template, request, send_file
-import pandas as pd
+from flask import Flask, jsonify, make_response, render_template, request, send_file, url_for
+from werkzeug.utils import secure_filename
+import cProfile
+import io
+import json
+import mimetypes
 import os
-from openpyxl import Workbook
-from openpyxl.styles import PatternFill
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pipeline import pipeline_stages
+from instrumentation import Metrics, collect_timings, stage
+from jobs import JobQueue
+from loader import format_extensions, intermediate_formats, load_seat_matrix, read_frame
+from policy import Policy, default_policy
+from processing import run_process
+from query import SeatIndex, index_columns
+from result_cache import ResultCache
+from scenarios import compare_scenarios, load_scenarios
 
 app = Flask(__name__)
+# Only background jobs save their upload to disk, in a private directory here.
 UPLOAD_FOLDER = os.path.abspath('uploads')
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-
-category_percentages = {
-    'OC': 0.31, 'BC': 0.265, 'BCM': 0.035, 'MBC': 0.20,
-    'SC': 0.15, 'SCA': 0.03, 'ST': 0.01
-}
-
-def round_to_sum(values):
-    original_sum = round(sum(values))
-    floored_values = [int(v) for v in values]
-    floored_sum = sum(floored_values)
-    difference = original_sum - floored_sum
-    
-    remainders = sorted(enumerate(values), key=lambda x: x[1] - floored_values[x[0]], reverse=True)
-    for i in range(difference):
-        floored_values[remainders[i][0]] += 1
-    return floored_values
-
-def add_computed_columns(input_file):
-    df = pd.read_csv(input_file)
-    df.columns = df.columns.str.strip().str.lower()
-    df['total'] = df['total'].astype(float)
-    df['general'] = df['total'] * 0.925
-    df['7.5% reservation'] = df['total'] * 0.075
-    output_file = os.path.join(UPLOAD_FOLDER, "1_" + os.path.basename(input_file))
-    df.to_csv(output_file, index=False)
-    return output_file
-
-def process_csv(input_file, output_file, column_names):
-    df = pd.read_csv(input_file)
-    df.columns = df.columns.str.strip().str.lower()
-    df['total'] = df['total'].astype(float)
-    df['general'] = df['total'] * 0.925
-    df['7.5% reservation'] = df['total'] * 0.075
-    
-    for category, percentage in category_percentages.items():
-        df[category] = df['general'] * percentage
-        df[f'{category}_7.5'] = df['7.5% reservation'] * percentage
-    
-    for column_name in column_names:
-        if column_name in df.columns:
-            values = df[column_name].tolist()
-            adjusted_values = round_to_sum(values)
-            df[f'Rounded_{column_name}'] = adjusted_values
-            df[f'Difference_{column_name}'] = [round(adjusted - original, 2) for adjusted, original in zip(adjusted_values, values)]
-    
-    df.to_csv(output_file, index=False, float_format="%.4f")
-    return output_file
+# Synchronous results are built in memory up to this size before spilling to a temporary file.
+SPOOL_MAX_SIZE = int(os.environ.get('SMAAT_SPOOL_MAX_BYTES', 64 * 1024 * 1024))
+CACHE_FOLDER = os.path.abspath('cache')
+result_cache = ResultCache(CACHE_FOLDER)
+job_queue = JobQueue(max_workers=int(os.environ.get('SMAAT_JOB_WORKERS', 0)) or None)
+# When set, every processing request is profiled and its stats dumped here.
+PROFILE_FOLDER = os.environ.get('SMAAT_PROFILE_DIR')
+# Only one profiler can be active per process (Python 3.12+ refuses a
+# second one), so overlapping requests go unprofiled.
+profile_lock = threading.Lock()
+
+metrics = Metrics()
+metrics.describe('smaat_request_duration_seconds', "Time spent handling a processing request.")
+metrics.describe('smaat_stage_duration_seconds', "Time spent in each processing stage.")
+metrics.describe('smaat_rows_processed_total', "Rows read from uploaded seat matrices.")
+
+# Reservation policy for every upload; SMAAT_POLICY names a JSON/YAML policy file.
+policy = Policy.from_file(os.environ['SMAAT_POLICY']) if os.environ.get('SMAAT_POLICY') else default_policy
+
+# The latest processed matrix with rounded seats, indexed for /query by a
+# single background thread.
+seat_index = None
+index_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='seat-index')
+
+process_types = ['process1', 'process2', 'process3', 'process4', 'pipeline']
+
+def process_params(process_type, form):
+    # Everything besides the upload itself that changes the generated file.
+    params = {'process_type': process_type, 'policy': policy.to_dict()}
+    if process_type == 'process2':
+        params['column_names'] = ['total']
+    elif process_type == 'process3':
+        params['column_names'] = policy.category_columns
+    elif process_type == 'pipeline':
+        params['stages'] = form.getlist('stages') or list(pipeline_stages)
+    if process_type != 'process4':
+        params['output_format'] = form.get('output_format', 'csv')
+    return params
 
-def process_csv_to_excel(file_path, output_file):
-    df = pd.read_csv(file_path)
-    required_columns = {"7.5% reservation", "general", "total", "oc", "bc", "bcm", "mbc", "sc", "sca", "st", 
-                        "oc_7.5", "bc_7.5", "bcm_7.5", "mbc_7.5", "sc_7.5", "sca_7.5", "st_7.5"}
+def output_name(params, filename):
+    process_type = params['process_type']
+    if process_type == 'process4':
+        return f"4_{filename}.xlsx"
+    if process_type == 'pipeline':
+        extension = ".xlsx" if 'excel' in params['stages'] else intermediate_formats.get(params['output_format'], ".csv")
+        return f"pipeline_{os.path.splitext(filename)[0]}{extension}"
+    extension = intermediate_formats.get(params['output_format'], ".csv")
+    if extension == ".csv":
+        return f"{process_type[-1]}_{filename}"
+    return f"{process_type[-1]}_{os.path.splitext(filename)[0]}{extension}"
+
+def save_upload(data, filename):
+    # A private directory per upload, so concurrent uploads of the same
+    # filename cannot overwrite each other.
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    work_dir = tempfile.mkdtemp(dir=UPLOAD_FOLDER)
+    file_path = os.path.join(work_dir, filename)
+    with open(file_path, 'wb') as f:
+        f.write(data)
+    return work_dir, file_path
+
+def upload_source(data, filename):
+    source = io.BytesIO(data)
+    source.name = filename
+    return source
+
+def stream_file(f, chunk_size=64 * 1024):
+    # Yields the file from its start and closes it once sent (or abandoned).
+    try:
+        f.seek(0)
+        while True:
+            block = f.read(chunk_size)
+            if not block:
+                break
+            yield block
+    finally:
+        f.close()
+
+def streamed_response(f, download_name):
+    # No Content-Length: the body goes out with chunked transfer encoding.
+    mimetype = mimetypes.guess_type(download_name)[0] or 'application/octet-stream'
+    response = app.response_class(stream_file(f), mimetype=mimetype, direct_passthrough=True)
+    response.headers.set('Content-Disposition', 'attachment', filename=download_name)
+    return response
+
+def enqueue_job(data, filename, params, key, download_name):
+    cached_file = result_cache.get(key)
+    if cached_file is not None:
+        return job_queue.add_finished(cached_file, download_name=download_name)
     
-    if not required_columns.issubset(df.columns):
-        raise ValueError(f"Missing required columns: {required_columns - set(df.columns)}")
+    work_dir, file_path = save_upload(data, filename)
+    return job_queue.submit(
+        run_process,
+        (params, file_path, os.path.join(work_dir, download_name)),
+        on_done=lambda output_file: publish_result(result_cache.put(key, output_file), params, download_name),
+        cleanup=lambda: shutil.rmtree(work_dir, ignore_errors=True),
+        download_name=download_name,
+    )
+
+def has_category_seats(params):
+    # Results with a Rounded_ column for every category: process3 and
+    # pipelines that round but do not end in Excel.
+    if params['process_type'] == 'pipeline':
+        return 'rounded' in params['stages'] and 'excel' not in params['stages']
+    return params['process_type'] == 'process3'
+
+def build_index(cached_file, params, download_name):
+    global seat_index
+    extension = os.path.splitext(download_name)[1].lower()
+    try:
+        df = read_frame(cached_file, format_extensions.get(extension, 'csv'))
+        rounded = {f"Rounded_{column}" for column in policy.category_columns}
+        if 'college code' in df.columns and rounded.issubset(df.columns):
+            seat_index = SeatIndex(df, source=cached_file)
+    except Exception:
+        app.logger.exception("Could not index %s for /query", cached_file)
+
+def publish_result(cached_file, params, download_name):
+    """Make a result with rounded category seats the matrix /query answers from.
+
+    The file is read and indexed on the index thread, off the request path;
+    results are indexed in the order they are published.
+    """
+    if has_category_seats(params) and (seat_index is None or seat_index.source != cached_file):
+        index_executor.submit(build_index, cached_file, params, download_name)
+    return cached_file
+
+def process_upload(file, process_type):
+    """Handle a validated upload; returns the response and its cache status."""
+    params = process_params(process_type, request.form)
+    filename = secure_filename(file.filename) or "upload.csv"
+    download_name = output_name(params, filename)
+    with stage('upload'):
+        data = file.read()
+        key = result_cache.make_key(data, params)
     
-    df['general+7.5% reservation'] = df['7.5% reservation'] + df['general']
-    df['General Sum'] = df[['oc', 'bc', 'bcm', 'mbc', 'sc', 'sca', 'st']].sum(axis=1)
-    df['7.5% Reservation Sum'] = df[['oc_7.5', 'bc_7.5', 'bcm_7.5', 'mbc_7.5', 'sc_7.5', 'sca_7.5', 'st_7.5']].sum(axis=1)
+    if request.form.get('async'):
+        job_id = enqueue_job(data, filename, params, key, download_name)
+        return jsonify({
+            'job_id': job_id,
+            'status_url': url_for('job_status', job_id=job_id),
+            'download_url': url_for('job_download', job_id=job_id),
+        }), 202, 'async'
     
-    wb = Workbook()
-    ws = wb.active
-    ws.append(df.columns.tolist())
-    for index, row in df.iterrows():
-        ws.append(row.tolist())
+    cached_file = result_cache.get(key)
+    if cached_file is not None:
+        with stage('publish'):
+            publish_result(cached_file, params, download_name)
+        return send_file(cached_file, as_attachment=True, download_name=download_name), 200, 'hit'
     
-    wb.save(output_file)
-    return output_file
+    # The upload is parsed straight from memory and the result is built in a
+    # spooled buffer, stored in the cache and streamed back from the buffer.
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    try:
+        run_process(params, upload_source(data, filename), output)
+        with stage('cache_store'):
+            cached_file = result_cache.put(key, output)
+        with stage('publish'):
+            publish_result(cached_file, params, download_name)
+    except ValueError as e:
+        output.close()
+        return str(e), 200, 'error'
+    except ImportError as e:
+        # An optional dependency of the chosen format (pyarrow for Parquet/Feather).
+        output.close()
+        return f"This output format is not available on the server: {e}", 200, 'error'
+    except BaseException:
+        output.close()
+        raise
+    return streamed_response(output, download_name), 200, 'miss'
+
+def record_metrics(process_type, cache_status, seconds, timings):
+    metrics.observe('smaat_request_duration_seconds', seconds, process_type=process_type, cache=cache_status)
+    for entry in timings.stages:
+        metrics.observe('smaat_stage_duration_seconds', entry['seconds'],
+                        process_type=process_type, stage=entry['stage'])
+        if entry['stage'] == 'read' and entry['rows']:
+            metrics.inc('smaat_rows_processed_total', entry['rows'], process_type=process_type)
 
 @app.route('/', methods=['GET', 'POST'])
 def index():
@@ -86,24 +212,122 @@ def index():
         if file.filename == '':
             return "No file selected for uploading."
         
-        file_path = os.path.join(UPLOAD_FOLDER, file.filename)
-        file.save(file_path)
-        
         process_type = request.form['process_type']
-        if process_type == 'process1':
-            output_file = add_computed_columns(file_path)
-        elif process_type == 'process2':
-            output_file = process_csv(file_path, os.path.join(UPLOAD_FOLDER, f"2_{file.filename}"), ['total'])
-        elif process_type == 'process3':
-            output_file = process_csv(file_path, os.path.join(UPLOAD_FOLDER, f"3_{file.filename}"), list(category_percentages.keys()) + [f"{key}_7.5" for key in category_percentages.keys()])
-        elif process_type == 'process4':
-            output_file = process_csv_to_excel(file_path, os.path.join(UPLOAD_FOLDER, f"4_{file.filename}.xlsx"))
-        else:
+        if process_type not in process_types:
             return "Invalid process type."
         
-        return send_file(output_file, as_attachment=True)
+        profiler = cProfile.Profile() if PROFILE_FOLDER and profile_lock.acquire(blocking=False) else None
+        start = time.perf_counter()
+        with collect_timings() as timings:
+            try:
+                if profiler:
+                    profiler.enable()
+                body, status, cache_status = process_upload(file, process_type)
+            finally:
+                if profiler:
+                    profiler.disable()
+                    profile_lock.release()
+        seconds = time.perf_counter() - start
+        
+        if profiler:
+            os.makedirs(PROFILE_FOLDER, exist_ok=True)
+            profiler.dump_stats(os.path.join(PROFILE_FOLDER, f"{time.time_ns()}_{process_type}.prof"))
+        record_metrics(process_type, cache_status, seconds, timings)
+        
+        response = make_response(body, status)
+        server_timing = timings.server_timing()
+        response.headers['Server-Timing'] = f"{server_timing}, total;dur={seconds * 1000:.1f}".lstrip(", ")
+        return response
     
     return render_template('index.html')
 
+@app.route('/scenarios', methods=['POST'])
+def scenarios_report():
+    # One seat matrix plus a JSON list of policy overrides in the
+    # 'scenarios' form field; every scenario is evaluated in one pass.
+    if 'file' not in request.files:
+        return jsonify({'error': "No file part in the request."}), 400
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({'error': "No file selected for uploading."}), 400
+    
+    try:
+        policies = load_scenarios(json.loads(request.form.get('scenarios', '[]')), policy)
+        report = compare_scenarios(load_seat_matrix(file), policies)
+    except (ValueError, KeyError) as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({
+        'policy': policy.name,
+        'columns': report.columns.tolist(),
+        'scenarios': json.loads(report.to_json(orient='records')),
+    })
+
+@app.route('/query')
+def query():
+    # Filters are index columns with '_' for spaces (college_code=1&district=Salem,
+    # repeatable); sum=Rounded_BC,... adds totals, grouped by group_by if given.
+    index = seat_index
+    if index is None:
+        return jsonify({'error': "No processed seat matrix loaded yet."}), 404
+    
+    filters = {}
+    for column in index_columns:
+        values = request.args.getlist(column.replace(' ', '_'))
+        if ' ' in column:
+            values += request.args.getlist(column)
+        if values:
+            filters[column] = [value for item in values for value in item.split(',')]
+    columns = [column for column in request.args.get('sum', '').split(',') if column]
+    group_by = request.args.get('group_by')
+    if group_by:
+        group_by = group_by.replace('_', ' ')
+    
+    try:
+        positions = index.select(filters)
+        result = {'rows': len(positions)}
+        if columns or group_by:
+            result['totals'] = index.totals(positions, columns, group_by)
+        else:
+            limit = request.args.get('limit', 50, type=int)
+            result['records'] = index.records(positions, limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(result)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = job_queue.status(job_id)
+    if job is None:
+        return jsonify({'error': "Unknown job."}), 404
+    return jsonify({key: job[key] for key in ('id', 'status', 'stage', 'rows', 'error')})
+
+@app.route('/jobs/<job_id>/download')
+def job_download(job_id):
+    job = job_queue.status(job_id)
+    if job is None:
+        return jsonify({'error': "Unknown job."}), 404
+    if job['status'] != 'done':
+        return jsonify({'error': f"Job is {job['status']}."}), 409
+    # Opened before sending, so a cache eviction cannot remove it mid-response.
+    try:
+        f = open(job['output_file'], 'rb')
+    except FileNotFoundError:
+        return jsonify({'error': "The job's output has expired from the cache; upload the file again."}), 410
+    return send_file(f, as_attachment=True, download_name=job['download_name'])
+
+def start_workers():
+    """Start the background job workers now instead of on the first async upload.
+
+    Called by ``python app.py`` when SMAAT_WARM_WORKERS is set; other servers
+    call it from their startup hook (e.g. gunicorn's post_worker_init).
+    """
+    job_queue.start([policy])
+
 if __name__ == '__main__':
+    if os.environ.get('SMAAT_WARM_WORKERS'):
+        start_workers()
     app.run(debug=True)
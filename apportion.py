@@ -0,0 +1,262 @@
+import numpy as np
+import pandas as pd
+
+
+def _column_sums(values):
+    # np.cumsum accumulates strictly left to right, so the last row matches
+    # Python's sum() on the same column bit for bit (np.sum would not, it
+    # uses pairwise summation).
+    if len(values) == 0:
+        return np.zeros((1, values.shape[1]))
+    return np.cumsum(values, axis=0)[-1:]
+
+
+def _segment_sums(values, starts, lengths):
+    # Same left-to-right order as sum() on each segment: walk the segments
+    # in lock step, one row position at a time.
+    sums = np.zeros((len(starts), values.shape[1]))
+    for position in range(lengths.max(initial=0)):
+        live = lengths > position
+        sums[live] += values[starts[live] + position]
+    return sums
+
+
+def _rank_descending(remainders, starts):
+    # Rank of every cell within its (segment, column), largest remainder
+    # first and ties broken by row order - the same order as a stable
+    # sort(reverse=True) on each segment.
+    n_rows, n_cols = remainders.shape
+    lengths = np.diff(np.append(starts, n_rows))
+    segment_of_row = np.repeat(np.arange(len(starts)), lengths)
+    longest = lengths.max(initial=0)
+    if len(starts) * longest <= 4 * n_rows:
+        # Segments padded to the longest one and sorted along one axis: many
+        # short sorts instead of one global sort.
+        position = np.arange(n_rows) - starts[segment_of_row]
+        padded = np.full((len(starts), longest, n_cols), np.inf)
+        padded[segment_of_row, position] = -remainders
+        order = np.argsort(padded, axis=1, kind='stable')
+        ranks = np.empty_like(order)
+        np.put_along_axis(ranks, order, np.arange(longest)[None, :, None], axis=1)
+        return ranks[segment_of_row, position], segment_of_row
+
+    flat = remainders.T.ravel()
+    segment_ids = (np.arange(n_cols)[:, None] * len(starts) + segment_of_row).ravel()
+    segment_starts = (np.arange(n_cols)[:, None] * n_rows + starts).ravel()
+    order = np.lexsort((-flat, segment_ids))
+    ranks = np.empty(flat.size, dtype=np.int64)
+    ranks[order] = np.arange(flat.size) - segment_starts[segment_ids[order]]
+    return ranks.reshape(n_cols, n_rows).T, segment_of_row
+
+
+def group_offsets(keys):
+    """Stable group-by-key ordering of ``keys``.
+
+    Returns the row order that makes each key's rows contiguous (keys sorted,
+    original order kept inside a key, missing keys dropped, like groupby) and
+    the start offset of every group within that order.
+    """
+    codes, _ = pd.factorize(np.asarray(keys), sort=True)
+    order = np.argsort(codes, kind='stable')
+    order = order[codes[order] >= 0]
+    counts = np.bincount(codes[order])
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    return order, starts
+
+
+def round_to_sum_matrix(values, starts=None):
+    """Largest-remainder rounding of every column of a rows x columns matrix.
+
+    Each column is floored and the seats lost to flooring are handed back to
+    the rows with the largest fractional parts, so every column keeps the
+    rounded sum of its original values.  With ``starts`` (sorted segment
+    offsets, see group_offsets) each contiguous segment is rounded on its own.
+    """
+    values = np.asarray(values, dtype=float)
+    one_dimensional = values.ndim == 1
+    if one_dimensional:
+        values = values[:, None]
+
+    if starts is None:
+        starts = np.zeros(1, dtype=np.int64)
+        sums = _column_sums(values)
+    else:
+        starts = np.asarray(starts, dtype=np.int64)
+        lengths = np.diff(np.append(starts, len(values)))
+        sums = _segment_sums(values, starts, lengths)
+
+    floored = np.trunc(values)
+    remainders = values - floored
+    floored = floored.astype(np.int64)
+
+    targets = np.round(sums).astype(np.int64)
+    if len(values):
+        difference = targets - np.add.reduceat(floored, starts, axis=0)
+    else:
+        difference = targets
+
+    ranks, segment_of_row = _rank_descending(remainders, starts)
+    rounded = floored + (ranks < difference[segment_of_row])
+    return rounded[:, 0] if one_dimensional else rounded
+
+
+def _round_half_even(numerator, denominator):
+    # numerator / denominator to the nearest integer, ties to even (as
+    # round() does), in integer arithmetic.
+    quotient, remainder = np.divmod(numerator, denominator)
+    twice = 2 * remainder
+    return quotient + ((twice > denominator) | ((twice == denominator) & (quotient % 2 == 1)))
+
+
+def scale_values(values, scale):
+    """values as int64 multiples of 1/scale, e.g. seats * 0.925 * 0.265 in millionths."""
+    values = np.asarray(values, dtype=float)
+    scaled = np.rint(values * scale)
+    if np.abs(values * scale - scaled).max(initial=0) > 1e-3:
+        raise ValueError(f"Exact arithmetic needs values that are multiples of 1/{scale} "
+                         "(whole seat totals and decimal shares).")
+    if np.abs(scaled).max(initial=0) >= 2 ** 53:
+        raise ValueError("Values are too large for exact arithmetic.")
+    return scaled.astype(np.int64)
+
+
+def round_to_sum_exact(scaled, scale, starts=None):
+    """round_to_sum_matrix for values given as integers in units of 1/scale.
+
+    Floors, remainders and (segment) sums are exact integers, targets round
+    half to even and equal remainders go to the earlier row, so the result
+    does not depend on float evaluation order.
+    """
+    scaled = np.asarray(scaled, dtype=np.int64)
+    one_dimensional = scaled.ndim == 1
+    if one_dimensional:
+        scaled = scaled[:, None]
+    starts = np.zeros(1, dtype=np.int64) if starts is None else np.asarray(starts, dtype=np.int64)
+
+    floored, remainders = np.divmod(scaled, scale)
+    if len(scaled):
+        targets = _round_half_even(np.add.reduceat(scaled, starts, axis=0), scale)
+        difference = targets - np.add.reduceat(floored, starts, axis=0)
+    else:
+        difference = np.zeros((len(starts), scaled.shape[1]), dtype=np.int64)
+
+    ranks, segment_of_row = _rank_descending(remainders, starts)
+    rounded = floored + (ranks < difference[segment_of_row])
+    return rounded[:, 0] if one_dimensional else rounded
+
+
+def exact_differences(rounded, scaled, scale):
+    """rounded - value to 2 decimals (half to even) for values in units of 1/scale."""
+    hundredths = _round_half_even((np.asarray(rounded, dtype=np.int64) * scale - scaled) * 100, scale)
+    return hundredths / 100
+
+
+def _round_hundredths(values):
+    # Python's round(x, 2) for whole arrays: the exact binary value of x,
+    # mantissa * 2**exponent, times 100 is rounded half to even in integer
+    # arithmetic, and n / 100 is then the correctly rounded result round()
+    # returns.  np.round(x, 2) multiplies by 100 in floating point first and
+    # can land on the wrong side of a half-way point.
+    values = np.asarray(values, dtype=float)
+    finite = np.isfinite(values)
+    fraction, exponent = np.frexp(np.where(finite, np.abs(values), 0.0))
+    mantissa = (fraction * 2.0 ** 53).astype(np.int64)
+    # |x| * 100 = mantissa * 100 / 2**shift; shifts past 62 leave |x| * 100 < 1/8.
+    shift = 53 - exponent.astype(np.int64)
+    tiny = shift >= 63
+    small = (shift > 0) & ~tiny
+    shift = np.where(small, shift, 1)
+    hundreds = mantissa * 100
+    quotient = hundreds >> shift
+    remainder = hundreds - (quotient << shift)
+    half = np.int64(1) << (shift - 1)
+    nearest = quotient + ((remainder > half) | ((remainder == half) & (quotient % 2 == 1)))
+
+    result = np.where(tiny, 0.0, values)  # whole numbers (shift <= 0) stay as they are
+    result = np.where(small, nearest / 100, result)
+    result = np.where(finite, np.copysign(result, values), values)
+    # n beyond 2**53 is no longer exact as a float (|x| above ~9e13, never a
+    # seat difference); those cells go through round() itself.
+    for index in zip(*np.nonzero(small & (nearest >= 2 ** 53))):
+        result[index] = round(float(values[index]), 2)
+    return result
+
+
+def round_differences(rounded, values):
+    """round(rounded - value, 2) for whole arrays, matching Python's round() bit for bit."""
+    differences = np.asarray(rounded, dtype=float) - np.asarray(values, dtype=float)
+    result = np.round(differences, 2)
+    # np.round is only unreliable next to a half-way point (or for values too
+    # large to tell); those cells are rounded exactly.
+    scaled = np.abs(differences * 100)
+    with np.errstate(invalid='ignore'):
+        unsure = (np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6) | (scaled >= 2 ** 32)
+    result[unsure] = _round_hundredths(differences[unsure])
+    return result
+
+
+def round_to_sum(values):
+    return round_to_sum_matrix(values).tolist()
+
+
+def add_rounded_columns(df, column_names, group_column=None, scale=None, rounded=None):
+    """Add Rounded_<column> and Difference_<column> for each present column.
+
+    With ``group_column`` every group is rounded independently and the frame
+    comes back sorted by group (as groupby + concat would return it).  With
+    ``scale`` (see Policy.scale) the columns are snapped to exact multiples of
+    1/scale and rounded in integer arithmetic.  ``rounded`` supplies Rounded_
+    values already known (a rows x present columns array, rows in group
+    order) instead of rounding again.
+    """
+    starts = None
+    if group_column is not None:
+        order, starts = group_offsets(df[group_column])
+        df = df.take(order).reset_index(drop=True)
+
+    columns = [column_name for column_name in column_names if column_name in df.columns]
+    if not columns:
+        return df
+    values = df[columns].to_numpy(dtype=float)
+    if scale is None:
+        if rounded is None:
+            rounded = round_to_sum_matrix(values, starts)
+        differences = round_differences(rounded, values)
+    else:
+        scaled = scale_values(values, scale)
+        if rounded is None:
+            rounded = round_to_sum_exact(scaled, scale, starts)
+        differences = exact_differences(rounded, scaled, scale)
+        values = scaled / scale
+    for i, column_name in enumerate(columns):
+        if scale is not None:
+            df[column_name] = values[:, i]
+        df[f'Rounded_{column_name}'] = rounded[:, i]
+        df[f'Difference_{column_name}'] = differences[:, i]
+    return df
+
+
+def insert_group_totals(df, group_column, label="Total"):
+    """Insert a subtotal row after every group of a frame sorted by group."""
+    numeric_columns = df.select_dtypes(include='number').columns
+    codes, _ = pd.factorize(df[group_column], sort=True)
+    totals = df[numeric_columns].groupby(codes, sort=True).sum().astype(float)
+    totals[group_column] = label
+
+    # Row r of group g moves down by g places; subtotal g lands after the
+    # last row of its group.
+    group_ends = np.cumsum(np.bincount(codes))
+    positions = np.concatenate((
+        np.arange(len(df)) + codes,
+        group_ends + np.arange(len(totals)),
+    ))
+    combined = pd.concat([df, totals.reset_index(drop=True)], ignore_index=True)
+    return combined.take(np.argsort(positions, kind='stable')).reset_index(drop=True)
+
+
+def append_grand_total(df, group_column, label="Grand Total"):
+    numeric_columns = [col for col in df.columns if pd.api.types.is_numeric_dtype(df[col])]
+    final_total = dict.fromkeys(df.columns, "")
+    final_total.update(df[numeric_columns].sum())
+    final_total[group_column] = label
+    return pd.concat([df, pd.DataFrame([final_total])], ignore_index=True)
@@ -0,0 +1,131 @@
+import argparse
+import contextlib
+import glob
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from loader import intermediate_formats, load_seat_matrix
+from pipeline import pipeline_stages, run_pipeline, run_pipeline_chunked, write_output
+from policy import Policy, default_policy
+
+
+def collect_inputs(patterns):
+    input_files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "*")
+        input_files.extend(path for path in sorted(glob.glob(pattern))
+                           if os.path.basename(path) != "batch_summary.csv"
+                           and os.path.splitext(path)[1].lower() in ('.csv', '.parquet', '.feather', '.arrow'))
+    # Keep the first occurrence when patterns overlap.
+    return list(dict.fromkeys(input_files))
+
+
+def output_bases(input_files, output_dir):
+    """Output path (without extension) of every input file: pipeline_<name>.
+
+    Inputs that share a name get their path relative to the common directory
+    instead (district1/og.csv -> pipeline_district1_og); any output paths
+    still shared raise ValueError rather than overwrite each other.
+    """
+    stems = [os.path.splitext(os.path.basename(input_file))[0] for input_file in input_files]
+    counts = Counter(stems)
+    if max(counts.values(), default=0) > 1:
+        root = os.path.commonpath([os.path.dirname(os.path.abspath(input_file)) for input_file in input_files])
+        stems = [os.path.splitext(os.path.relpath(os.path.abspath(input_file), root))[0].replace(os.sep, "_")
+                 if counts[stem] > 1 else stem for input_file, stem in zip(input_files, stems)]
+    clashes = sorted(stem for stem, count in Counter(stems).items() if count > 1)
+    if clashes:
+        raise ValueError(f"Several inputs would be written to the same output: {', '.join(clashes)}")
+    return [os.path.join(output_dir, f"pipeline_{stem}") for stem in stems]
+
+
+def process_file(input_file, output_base, stages, output_format='csv', chunk_rows=None, policy=default_policy):
+    start = time.perf_counter()
+    if chunk_rows:
+        rows_done = []
+        output_file = run_pipeline_chunked(input_file, output_base, stages, output_format, chunk_rows,
+                                           lambda _, rows: rows_done.append(rows), policy)
+        rows_in = rows_done[-1] if rows_done else 0
+        rows_out = None
+    else:
+        df = load_seat_matrix(input_file, keep_case=policy.computed_columns)
+        rows_in = len(df)
+        df = run_pipeline(df, stages, policy=policy)
+        output_file = write_output(df, output_base, stages, output_format, policy)
+        rows_out = len(df)
+    return {
+        'input_file': input_file,
+        'output_file': output_file,
+        'rows_in': rows_in,
+        'rows_out': rows_out,
+        'seconds': round(time.perf_counter() - start, 3),
+        'error': "",
+    }
+
+
+def run_batch(input_files, output_dir, stages, max_workers=None, output_format='csv', chunk_rows=None,
+              policy=default_policy, executor=None):
+    """Process every file on a new process pool, or on ``executor`` (e.g. workers.warm_pool()) if given."""
+    if executor is not None:
+        # A shared pool's workers keep the working directory they started in.
+        input_files = [os.path.abspath(input_file) for input_file in input_files]
+        output_dir = os.path.abspath(output_dir)
+    outputs = output_bases(input_files, output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    results = []
+    with contextlib.nullcontext(executor) if executor is not None else ProcessPoolExecutor(max_workers) as pool:
+        futures = {pool.submit(process_file, input_file, output_base, stages, output_format, chunk_rows, policy): input_file
+                   for input_file, output_base in zip(input_files, outputs)}
+        for future, input_file in futures.items():
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append({'input_file': input_file, 'output_file': "", 'rows_in': 0,
+                                'rows_out': 0, 'seconds': 0.0, 'error': str(e)})
+    return pd.DataFrame(results)
+
+
+def main(argv=None, executor=None):
+    parser = argparse.ArgumentParser(prog="batch.py",
+                                     description="Run the seat matrix pipeline over many CSV files in parallel.")
+    parser.add_argument('inputs', nargs='+', help="CSV/Parquet/Feather files, directories or glob patterns")
+    parser.add_argument('--stages', nargs='+', default=list(pipeline_stages), choices=list(pipeline_stages))
+    parser.add_argument('--output-dir', default="processed")
+    parser.add_argument('--format', default='csv', choices=list(intermediate_formats),
+                        help="format of non-Excel outputs; parquet/feather keep full precision")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--chunk-rows', type=int, default=None,
+                        help="stream each CSV in college-aligned chunks of about this many rows to bound memory")
+    parser.add_argument('--policy', help="JSON/YAML reservation policy file (default: the built-in policy)")
+    parser.add_argument('--exact', action='store_true', help="round in exact integer arithmetic")
+    args = parser.parse_args(argv)
+
+    input_files = collect_inputs(args.inputs)
+    if not input_files:
+        parser.error("No input files found.")
+    try:
+        output_bases(input_files, args.output_dir)
+    except ValueError as e:
+        parser.error(str(e))
+
+    policy = Policy.from_file(args.policy) if args.policy else default_policy
+    if args.exact:
+        policy = policy.as_exact()
+    start = time.perf_counter()
+    summary = run_batch(input_files, args.output_dir, args.stages, args.workers, args.format, args.chunk_rows, policy,
+                        executor)
+    summary_file = os.path.join(args.output_dir, "batch_summary.csv")
+    summary.to_csv(summary_file, index=False)
+
+    print(summary.to_string(index=False))
+    print(f"{len(input_files)} files, {summary['rows_in'].sum()} rows in {time.perf_counter() - start:.2f}s")
+    print(f"Summary saved as {summary_file}")
+    return 1 if (summary['error'] != "").any() else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
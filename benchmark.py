@@ -0,0 +1,198 @@
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from apportion import add_rounded_columns
+from excel_export import write_excel_streaming
+from loader import load_seat_matrix
+from pipeline import add_category_columns, add_computed_columns, add_summary_columns, round_grouped
+from policy import Policy, default_policy
+from process4new import add_totals, clean_rows, compute_rows
+
+districts = ['ARIYALUR', 'CHENGALPET', 'CHENNAI', 'COIMBATORE', 'CUDDALORE', 'DHARMAPURI', 'DINDIGUL',
+             'ERODE', 'KANCHEEPURAM', 'MADURAI', 'SALEM', 'THANJAVUR', 'TIRUNELVELI', 'VELLORE']
+college_categories = ['GOVT', 'AU DEPT', 'GA', 'NM', 'MIN']
+course_codes = ['AD', 'AE', 'AG', 'BT', 'CE', 'CH', 'CS', 'EC', 'EE', 'EI', 'IT', 'ME', 'MR', 'PT', 'TX', 'XC']
+
+
+def synthesize_matrix(rows, colleges=None, seed=0, courses=None):
+    """A seat matrix shaped like govtreserved.csv with ``rows`` course rows.
+
+    Course rows are spread unevenly over the colleges (about four per college
+    unless ``colleges`` is given) and each course has 30 to 180 seats.  The
+    course names come from ``courses`` distinct codes (the 16 of
+    course_codes by default, made-up ones beyond that).
+    """
+    rng = np.random.default_rng(seed)
+    colleges = colleges or max(1, rows // 4)
+    names = course_codes + [f"C{i:03d}" for i in range(len(course_codes), courses or 0)]
+    names = names[:courses or len(course_codes)]
+    weights = rng.gamma(2.0, size=colleges)
+    college_of_row = np.sort(rng.choice(colleges, size=rows, p=weights / weights.sum()))
+
+    codes = 1000 + np.arange(colleges)
+    df = pd.DataFrame({
+        'College Code': codes[college_of_row],
+        'Category': np.asarray(college_categories)[rng.integers(0, len(college_categories), colleges)][college_of_row],
+        'Autonomous Status': np.where(rng.random(colleges) < 0.3, 'Autonomous', 'Non Autonomous')[college_of_row],
+        'Co.Ed Status': np.where(rng.random(colleges) < 0.05, 'WOMENS', 'Co.Ed')[college_of_row],
+        'District': np.asarray(districts)[rng.integers(0, len(districts), colleges)][college_of_row],
+        'College Name': np.char.add('Synthetic College of Engineering ', codes.astype(str))[college_of_row],
+        'COURSE': np.asarray(names)[rng.integers(0, len(names), rows)],
+        'TOTAL': rng.integers(30, 181, rows),
+    })
+    return df
+
+
+def measure(fn, args, trace_memory=False):
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(*args)
+    seconds = time.perf_counter() - start
+    peak = None
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return result, seconds, peak
+
+
+# Stages timed for each process type, as (stage name, fn(df, work_dir, policy) -> df).
+def _to_csv(df, work_dir, policy):
+    df.to_csv(os.path.join(work_dir, "out.csv"), index=False, float_format="%.4f")
+    return df
+
+
+def _to_xlsx(df, work_dir, policy):
+    write_excel_streaming(df, os.path.join(work_dir, "out.xlsx"), policy=policy)
+    return df
+
+
+def _categories(df, _, policy):
+    return add_category_columns(add_computed_columns(df, policy), policy)
+
+
+process_stages = {
+    'process1': [('computed', lambda df, _, policy: add_computed_columns(df, policy)), ('write_csv', _to_csv)],
+    'process2': [('categories', _categories),
+                 ('round_total',
+                  lambda df, _, policy: add_rounded_columns(df, ['total'], scale=policy.rounding_scale)),
+                 ('write_csv', _to_csv)],
+    'process3': [('categories', _categories),
+                 ('round_categories', lambda df, _, policy: add_rounded_columns(df, policy.category_columns,
+                                                                                scale=policy.rounding_scale)),
+                 ('write_csv', _to_csv)],
+    'process4': [('categories', _categories),
+                 ('summary', lambda df, _, policy: add_summary_columns(df, policy)), ('write_xlsx', _to_xlsx)],
+    'pipeline': [('computed', lambda df, _, policy: add_computed_columns(df, policy)),
+                 ('categories', lambda df, _, policy: add_category_columns(df, policy)),
+                 ('rounded', lambda df, _, policy: round_grouped(df, policy)),
+                 ('summary', lambda df, _, policy: add_summary_columns(df, policy)), ('write_xlsx', _to_xlsx)],
+    'process4new': [('compute_rows',
+                     lambda df, _, policy: compute_rows(clean_rows(df), list(policy.categories), policy)),
+                    ('totals', lambda df, _, policy: add_totals(df)), ('write_csv', _to_csv)],
+}
+
+
+def run_stages(input_file, process_type, work_dir, rows, max_excel_rows, trace_memory, policy=default_policy):
+    df, seconds, peak = measure(load_seat_matrix, (input_file,), trace_memory)
+    stage_results = [('load', seconds, peak)]
+    for stage, fn in process_stages[process_type]:
+        if stage == 'write_xlsx' and rows > max_excel_rows:
+            continue
+        df, seconds, peak = measure(fn, (df, work_dir, policy), trace_memory)
+        stage_results.append((stage, seconds, peak))
+    return stage_results
+
+
+def run_benchmarks(sizes, process_types, max_excel_rows=50000, seed=0, memory=True, colleges=None, courses=None,
+                   policy=default_policy):
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for rows in sizes:
+            input_file = os.path.join(work_dir, f"synthetic_{rows}.csv")
+            matrix = synthesize_matrix(rows, colleges, seed, courses)
+            matrix.to_csv(input_file, index=False)
+            shape = {'colleges': int(matrix['College Code'].nunique()), 'courses': int(matrix['COURSE'].nunique())}
+            for process_type in process_types:
+                # tracemalloc slows pure-Python code (openpyxl, CSV formatting)
+                # several times over, so peaks come from a second, traced run.
+                timed = run_stages(input_file, process_type, work_dir, rows, max_excel_rows, False, policy)
+                peaks = [None] * len(timed)
+                if memory:
+                    traced = run_stages(input_file, process_type, work_dir, rows, max_excel_rows, True, policy)
+                    peaks = [peak for _, _, peak in traced]
+                for (stage, seconds, _), peak in zip(timed, peaks):
+                    results.append({
+                        'process_type': process_type,
+                        'stage': stage,
+                        'rows': rows,
+                        **shape,
+                        'seconds': round(seconds, 6),
+                        'peak_mb': round(peak / 1e6, 3) if peak is not None else None,
+                        'rows_per_sec': round(rows / seconds) if seconds else None,
+                    })
+                print(f"{process_type:>11} {rows:>9} rows: "
+                      + ", ".join(f"{stage} {seconds:.3f}s" for stage, seconds, _ in timed))
+    return results
+
+
+def compare(results, baseline_file):
+    # Results from before colleges were recorded match on rows alone.
+    baseline = {(r['process_type'], r['stage'], r['rows'], r.get('colleges')): r['seconds']
+                for r in json.load(open(baseline_file))['results']}
+    print(f"{'process':>11} {'stage':>16} {'rows':>9} {'baseline':>10} {'now':>10} {'ratio':>7}")
+    for r in results:
+        before = (baseline.get((r['process_type'], r['stage'], r['rows'], r['colleges']))
+                  or baseline.get((r['process_type'], r['stage'], r['rows'], None)))
+        if before:
+            print(f"{r['process_type']:>11} {r['stage']:>16} {r['rows']:>9} {before:>10.4f} "
+                  f"{r['seconds']:>10.4f} {r['seconds'] / before:>7.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the seat matrix processing stages on synthetic data.")
+    parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000, 100000],
+                        help="course rows per synthetic matrix (e.g. 1000 ... 1000000)")
+    parser.add_argument('--process-types', nargs='+', default=list(process_stages), choices=list(process_stages))
+    parser.add_argument('--colleges', type=int, help="colleges per synthetic matrix (default: rows / 4)")
+    parser.add_argument('--courses', type=int, help="distinct course codes (default: the 16 real ones)")
+    parser.add_argument('--max-excel-rows', type=int, default=50000, help="skip XLSX writing above this size")
+    parser.add_argument('--no-memory', action='store_true', help="skip the traced run that records peak memory")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--policy', help="JSON/YAML reservation policy file (default: the built-in policy)")
+    parser.add_argument('--exact', action='store_true', help="round in exact integer arithmetic")
+    parser.add_argument('--output', default="bench_results.json")
+    parser.add_argument('--compare', help="earlier results JSON to compare against")
+    args = parser.parse_args(argv)
+
+    policy = Policy.from_file(args.policy) if args.policy else default_policy
+    if args.exact:
+        policy = policy.as_exact()
+    results = run_benchmarks(args.sizes, args.process_types, args.max_excel_rows, args.seed, not args.no_memory,
+                             args.colleges, args.courses, policy)
+    with open(args.output, 'w') as f:
+        json.dump({
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'seed': args.seed,
+            'colleges': args.colleges,
+            'courses': args.courses,
+            'policy': policy.to_dict(),
+            'results': results,
+        }, f, indent=2)
+    print(f"Results saved as {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+from apportion import group_offsets, round_to_sum_exact, round_to_sum_matrix, scale_values
+from loader import load_seat_matrix
+from pipeline import drop_total_rows, identifier_column
+from policy import Policy, default_policy
+
+# Grouping levels of the report, finest first; college code + course is
+# the key the years are joined on.
+default_levels = [(identifier_column, 'course'), (identifier_column,), ('district',), ('course',)]
+
+
+def parse_spec(spec):
+    """'2024:govt=govtreserved.csv' -> ('2024', 'govt', 'govtreserved.csv')."""
+    tag, separator, path = spec.partition('=')
+    year, _, quota = tag.partition(':')
+    if not separator or not year or not path:
+        raise ValueError(f"Expected YEAR:QUOTA=PATH, got '{spec}'.")
+    return year, quota or "all", path
+
+
+def _sort_key(values):
+    # College codes in numeric order, non-numeric codes after them.
+    numbers = pd.to_numeric(values, errors='coerce')
+    return np.lexsort((values, np.where(np.isnan(numbers), np.inf, numbers)))
+
+
+def _join_keys(per_file):
+    """One categorical over all files from per-file (codes, labels) pairs.
+
+    Only the distinct labels of each file are converted and hashed into the
+    shared categories, which come out sorted (numerically where possible).
+    """
+    labels = np.concatenate([np.asarray(uniques.astype(str).str.strip(), dtype=object) for _, uniques in per_file])
+    label_codes, categories = pd.factorize(labels)
+    categories = np.asarray(categories, dtype=object)
+    order = _sort_key(categories)
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+
+    codes = []
+    offset = 0
+    for file_codes, uniques in per_file:
+        codes.append(rank[label_codes[offset + file_codes]])
+        offset += len(uniques)
+    return pd.Categorical.from_codes(np.concatenate(codes), categories[order], ordered=True)
+
+
+def load_tagged(specs, columns, policy=default_policy):
+    """Load every (year, quota, path) and stack the course rows of ``columns`` with their tags.
+
+    The key columns come back as categoricals shared by all files, so
+    grouping and sorting work on integer codes.
+    """
+    keys = {column: [] for column in columns}
+    totals, files = [], []
+    for file_id, (year, quota, path) in enumerate(specs):
+        df = drop_total_rows(load_seat_matrix(path, keep_case=policy.computed_columns))
+        missing = set(columns) - set(df.columns)
+        if missing:
+            raise ValueError(f"Error: {path} has no {sorted(missing)} column.")
+        for column in columns:
+            codes, uniques = pd.factorize(df[column])
+            keys[column].append((codes, pd.Index(uniques)))
+        totals.append(df['total'].to_numpy(dtype=float))
+        files.append(np.full(len(df), file_id))
+
+    rows = pd.DataFrame({column: _join_keys(per_file) for column, per_file in keys.items()})
+    rows['total'] = np.concatenate(totals)
+    rows['file'] = np.concatenate(files)
+    for position, tag in enumerate(('year', 'quota')):
+        codes, categories = pd.factorize(np.array([str(spec[position]) for spec in specs], dtype=object), sort=True)
+        rows[tag] = pd.Categorical.from_codes(codes[rows['file'].to_numpy()], categories)
+    return rows
+
+
+def rounded_seats(rows, policy=default_policy):
+    """Rounded category seats of every stacked row, rounded per file and college in one pass."""
+    total = rows['total'].to_numpy(dtype=float)
+    quota_values = total[:, None] * np.array([share for _, share, _ in policy.quotas])
+    values = quota_values @ policy.coefficients
+
+    colleges = rows[identifier_column].cat.codes.to_numpy()
+    order, starts = group_offsets(rows['file'].to_numpy() * (colleges.max(initial=0) + 1) + colleges)
+    ordered = values[order]
+    if policy.exact:
+        rounded = round_to_sum_exact(scale_values(ordered, policy.scale), policy.scale, starts)
+    else:
+        rounded = round_to_sum_matrix(ordered, starts)
+
+    seats = np.empty_like(rounded)
+    seats[order] = rounded
+    return pd.DataFrame(seats, columns=[f"Rounded_{name}" for name in policy.category_names])
+
+
+def _group_ids(rows, columns):
+    # Combine the shared category codes of the key columns into one group id.
+    ids = np.zeros(len(rows), dtype=np.int64)
+    for column in columns:
+        ids, _ = pd.factorize(ids * len(rows[column].cat.categories) + rows[column].cat.codes.to_numpy())
+    return ids
+
+
+def aggregate_level(rows, values, columns):
+    """Sums and year-over-year deltas of ``values`` per group of ``columns``, year and quota.
+
+    Every group gets a row for each year of a quota in which it has seats
+    or had seats the year before, so dropped courses show up with 0 seats
+    and a negative delta.  Deltas of the first year of a quota are NaN.
+    """
+    groups = _group_ids(rows, columns)
+    n_groups = groups.max(initial=-1) + 1
+    quota_codes = rows['quota'].cat.codes.to_numpy().astype(np.int64)
+    year_codes = rows['year'].cat.codes.to_numpy()
+    tag_ids, tag_keys = pd.factorize(quota_codes * len(rows['year'].cat.categories) + year_codes, sort=True)
+    tags = pd.DataFrame({
+        'quota': rows['quota'].cat.categories[tag_keys // len(rows['year'].cat.categories)],
+        'year': rows['year'].cat.categories[tag_keys % len(rows['year'].cat.categories)],
+    })
+
+    cells = groups * len(tags) + tag_ids
+    order = np.argsort(cells, kind='stable')
+    cells = cells[order]
+    starts = np.flatnonzero(np.r_[True, cells[1:] != cells[:-1]])
+    present = cells[starts]
+    sums = np.add.reduceat(values[order], starts, axis=0) if len(order) else np.zeros((0, values.shape[1]))
+    counts = np.diff(np.r_[starts, len(cells)])
+
+    # Any row of a group carries its labels.
+    group_row = np.empty(n_groups, dtype=np.int64)
+    group_row[present // len(tags)] = order[starts]
+    labels = rows.iloc[group_row][list(columns)].reset_index(drop=True)
+
+    parts = []
+    for quota, quota_tags in tags.groupby('quota', sort=False):
+        tag_index = quota_tags.index.to_numpy()
+        years = quota_tags['year'].to_numpy()
+        in_quota = np.isin(present % len(tags), tag_index)
+        cell_groups = present[in_quota] // len(tags)
+        year_position = np.searchsorted(tag_index, present[in_quota] % len(tags))
+
+        quota_groups, group_position = np.unique(cell_groups, return_inverse=True)
+        grid = np.zeros((len(quota_groups), len(years), sums.shape[1]))
+        grid[group_position, year_position] = sums[in_quota]
+        rows_grid = np.zeros((len(quota_groups), len(years)), dtype=np.int64)
+        rows_grid[group_position, year_position] = counts[in_quota]
+        deltas = np.diff(grid, axis=1, prepend=np.nan)
+
+        has_seats = rows_grid > 0
+        keep = has_seats | np.c_[np.zeros((len(quota_groups), 1), dtype=bool), has_seats[:, :-1]]
+        group_index, year_index = np.nonzero(keep)
+        part = labels.iloc[quota_groups[group_index]].reset_index(drop=True)
+        part['quota'] = quota
+        part['year'] = years[year_index]
+        part['rows'] = rows_grid[group_index, year_index]
+        parts.append((part, grid[group_index, year_index], deltas[group_index, year_index]))
+    return parts
+
+
+def consolidate(specs, levels=default_levels, policy=default_policy):
+    """Consolidate tagged seat matrices into one report per level.
+
+    ``specs`` is a list of (year, quota, path).  The matrices are loaded and
+    stacked once, category seats are computed for all rows with one matrix
+    multiply and rounded per file and college in one grouped pass; each
+    level is then a hash-join of its key columns and one sorted reduction.
+    Returns {level columns: DataFrame}.
+    """
+    key_columns = list(dict.fromkeys(column for level in levels for column in level))
+    rows = load_tagged(specs, list(dict.fromkeys([identifier_column, *key_columns])), policy)
+    seats = rounded_seats(rows, policy)
+    value_names = ['total'] + list(seats.columns)
+    values = np.column_stack([rows['total'].to_numpy(dtype=float), seats.to_numpy(dtype=float)])
+
+    reports = {}
+    for level in levels:
+        frames = []
+        for part, sums, deltas in aggregate_level(rows, values, level):
+            numbers = pd.DataFrame(np.hstack([sums, deltas]),
+                                   columns=value_names + [f"Delta_{name}" for name in value_names])
+            frames.append(pd.concat([part, numbers], axis=1))
+        report = pd.concat(frames, ignore_index=True)
+        for name in value_names:
+            # Whole seat counts stay integers; first-year deltas are left empty.
+            if np.array_equal(report[name], np.trunc(report[name])):
+                report[name] = report[name].astype(np.int64)
+                report[f"Delta_{name}"] = report[f"Delta_{name}"].astype('Int64')
+        reports[tuple(level)] = report.sort_values([*level, 'quota', 'year'], kind='stable', ignore_index=True)
+    return reports
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Consolidate seat matrices across years and quota types.")
+    parser.add_argument('inputs', nargs='+', help="YEAR:QUOTA=PATH, e.g. 2024:govt=govtreserved.csv")
+    parser.add_argument('--level', action='append', dest='levels',
+                        help="comma-separated grouping columns, repeatable "
+                             "(default: college code+course, college code, district, course)")
+    parser.add_argument('--policy', help="JSON/YAML reservation policy file (default: the built-in policy)")
+    parser.add_argument('--exact', action='store_true', help="round in exact integer arithmetic")
+    parser.add_argument('--output-dir', default="consolidated")
+    args = parser.parse_args(argv)
+
+    policy = Policy.from_file(args.policy) if args.policy else default_policy
+    if args.exact:
+        policy = policy.as_exact()
+    levels = [tuple(column.strip() for column in level.split(',')) for level in args.levels] if args.levels else default_levels
+
+    reports = consolidate([parse_spec(spec) for spec in args.inputs], levels, policy)
+    os.makedirs(args.output_dir, exist_ok=True)
+    for level, report in reports.items():
+        output_file = os.path.join(args.output_dir, "by_" + "_".join(level).replace(' ', '_') + ".csv")
+        report.to_csv(output_file, index=False, float_format="%.4f")
+        print(f"{len(report)} rows saved as {output_file}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from policy import default_policy
+
+# openpyxl is imported on first use, so importing this module stays cheap
+# for callers that never write Excel.
+
+
+@lru_cache(maxsize=None)
+def _fills():
+    from openpyxl.styles import PatternFill
+    green_fill = PatternFill(start_color="00FF00", end_color="00FF00", fill_type="solid")
+    red_fill = PatternFill(start_color="FF0000", end_color="FF0000", fill_type="solid")
+    return green_fill, red_fill
+
+
+def sum_checks(policy=default_policy):
+    # Computed sum column -> the column it has to agree with, e.g.
+    # 'General Sum' -> 'general' (see pipeline.add_summary_columns).
+    return {f"{quota.title()} Sum": quota for quota in policy.quota_columns}
+
+
+def _column_chunk(values, start, end):
+    chunk = values[start:end]
+    if chunk.dtype.kind in 'fO':
+        # Empty cells instead of NaN, which Excel refuses to open.
+        chunk = chunk.astype(object)
+        chunk[pd.isna(chunk)] = None
+    return chunk.tolist()
+
+
+def _sum_check_matches(df, policy):
+    matches = {}
+    for sum_column, expected_column in sum_checks(policy).items():
+        if sum_column in df.columns and expected_column in df.columns:
+            matches[df.columns.get_loc(sum_column)] = np.isclose(
+                df[sum_column].to_numpy(dtype=float),
+                df[expected_column].to_numpy(dtype=float),
+                atol=1e-6,
+            )
+    return matches
+
+
+def append_frame(ws, df, highlight=True, chunk_size=5000, policy=default_policy):
+    """Append the rows of df to a write-only worksheet, chunk by chunk."""
+    from openpyxl.cell import WriteOnlyCell
+    green_fill, red_fill = _fills()
+    columns = [df.iloc[:, i].to_numpy() for i in range(df.shape[1])]
+    matches = _sum_check_matches(df, policy) if highlight else {}
+
+    for start in range(0, len(df), chunk_size):
+        end = min(start + chunk_size, len(df))
+        chunk = [_column_chunk(values, start, end) for values in columns]
+        for offset, row in enumerate(zip(*chunk)):
+            if matches:
+                row = list(row)
+                for col, matched in matches.items():
+                    cell = WriteOnlyCell(ws, value=row[col])
+                    cell.fill = green_fill if matched[start + offset] else red_fill
+                    row[col] = cell
+            ws.append(row)
+
+
+def write_excel_streaming(df, output_file, highlight=True, chunk_size=5000, policy=default_policy):
+    """Write df to XLSX through a write-only worksheet.
+
+    Rows are produced from the column arrays chunk by chunk, so memory does not
+    grow with the row count.  With ``highlight`` the '<Quota> Sum' cells of
+    every quota of ``policy`` (General Sum, 7.5% Reservation Sum) are filled
+    green when they agree with the quota column and red when they do not.
+    """
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(df.columns.tolist())
+    append_frame(ws, df, highlight, chunk_size, policy)
+    wb.save(output_file)
+    return output_file
@@ -0,0 +1,121 @@
+import contextvars
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; covers sub-millisecond cache hits up to multi-minute workbooks.
+default_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+class StageTimings:
+    def __init__(self):
+        self.stages = []
+
+    def add(self, name, seconds, rows=None):
+        self.stages.append({'stage': name, 'seconds': seconds, 'rows': rows})
+
+    def server_timing(self):
+        return ", ".join(
+            f"{re.sub(r'[^A-Za-z0-9_-]', '_', entry['stage'])};dur={entry['seconds'] * 1000:.1f}"
+            for entry in self.stages
+        )
+
+
+_current_timings = contextvars.ContextVar('stage_timings', default=None)
+
+
+class _Stage:
+    rows = None
+
+
+@contextmanager
+def collect_timings():
+    """Collect every stage() entered inside the block into a StageTimings."""
+    timings = StageTimings()
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+
+@contextmanager
+def stage(name):
+    """Time a processing stage; set ``.rows`` on the yielded object to record a row count.
+
+    Outside collect_timings() this does nothing, so library code can call it
+    unconditionally.
+    """
+    entry = _Stage()
+    timings = _current_timings.get()
+    if timings is None:
+        yield entry
+        return
+    start = time.perf_counter()
+    try:
+        yield entry
+    finally:
+        timings.add(name, time.perf_counter() - start, entry.rows)
+
+
+class Metrics:
+    """Process-local histograms and counters rendered in Prometheus text format."""
+
+    def __init__(self, buckets=default_buckets):
+        self.buckets = buckets
+        self._histograms = {}
+        self._counters = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            counts, total = self._histograms.get(key, ([0] * len(self.buckets), 0.0))
+            counts = [count + (value <= bound) for count, bound in zip(counts, self.buckets)]
+            self._histograms[key] = (counts, total + value)
+            self._counters[(f"{name}_count", key[1])] = self._counters.get((f"{name}_count", key[1]), 0) + 1
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    @staticmethod
+    def _labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+    def render(self):
+        lines = []
+        with self._lock:
+            histograms = dict(self._histograms)
+            counters = dict(self._counters)
+        for name in sorted({name for name, _ in histograms}):
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} histogram")
+            for (hist_name, labels), (counts, total) in sorted(histograms.items()):
+                if hist_name != name:
+                    continue
+                for bound, count in zip(self.buckets, counts):
+                    lines.append(f"{name}_bucket{self._labels(labels, [('le', bound)])} {count}")
+                count = counters[(f"{name}_count", labels)]
+                lines.append(f"{name}_bucket{self._labels(labels, [('le', '+Inf')])} {count}")
+                lines.append(f"{name}_sum{self._labels(labels)} {total}")
+                lines.append(f"{name}_count{self._labels(labels)} {count}")
+        histogram_counts = {f"{name}_count" for name, _ in histograms}
+        for name in sorted({name for name, _ in counters} - histogram_counts):
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} counter")
+            for (counter_name, labels), value in sorted(counters.items()):
+                if counter_name == name:
+                    lines.append(f"{name}{self._labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
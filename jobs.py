@@ -0,0 +1,98 @@
+import multiprocessing
+import os
+import threading
+import uuid
+from workers import warm_pool
+
+
+def _run_job(progress, job_id, fn, args):
+    def report(stage, rows=None):
+        progress[job_id] = {'stage': stage, 'rows': rows}
+
+    report('started')
+    return fn(*args, progress=report)
+
+
+class JobQueue:
+    """Runs processing jobs on a local process pool and tracks their progress.
+
+    ``fn`` must be a module-level function taking a ``progress(stage, rows)``
+    keyword; workers report through a manager dict so status() can be polled
+    from any request thread.  The pool and manager start on first submit, or
+    ahead of it with start(); workers are pre-warmed (see workers.warm_pool).
+    """
+
+    def __init__(self, max_workers=None, max_finished=1000):
+        self.max_workers = max_workers or os.cpu_count()
+        self.max_finished = max_finished
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._progress = None
+
+    def _start(self, policies=()):
+        if self._executor is None:
+            self._progress = multiprocessing.Manager().dict()
+            self._executor = warm_pool(self.max_workers, policies=policies)
+
+    def start(self, policies=()):
+        """Start the workers now, with ``policies`` already compiled in each."""
+        with self._lock:
+            self._start(policies)
+
+    def _new_job(self, **fields):
+        job = {'id': uuid.uuid4().hex, 'status': 'queued', 'stage': None, 'rows': None,
+               'output_file': None, 'error': None}
+        job.update(fields)
+        with self._lock:
+            self._jobs[job['id']] = job
+            self._prune()
+        return job
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job['status'] in ('done', 'failed')]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def submit(self, fn, args, on_done=None, cleanup=None, **fields):
+        """Queue fn(*args) and return the job id.
+
+        on_done(result) runs in this process once the job succeeds and its
+        return value becomes the job's output_file; cleanup() runs afterwards
+        whatever the outcome.
+        """
+        with self._lock:
+            self._start()
+        job = self._new_job(**fields)
+        future = self._executor.submit(_run_job, self._progress, job['id'], fn, args)
+
+        def finish(future):
+            try:
+                result = future.result()
+                job['output_file'] = on_done(result) if on_done else result
+                job['status'] = job['stage'] = 'done'
+            except Exception as e:
+                job['error'] = str(e)
+                job['status'] = job['stage'] = 'failed'
+            finally:
+                if cleanup:
+                    cleanup()
+                self._progress.pop(job['id'], None)
+
+        future.add_done_callback(finish)
+        return job['id']
+
+    def add_finished(self, output_file, **fields):
+        """Record a job whose output already exists, e.g. a cache hit."""
+        return self._new_job(status='done', stage='done', output_file=output_file, **fields)['id']
+
+    def status(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        job = dict(job)
+        if job['status'] == 'queued' and self._progress is not None:
+            progress = self._progress.get(job_id)
+            if progress:
+                job.update(progress, status='running')
+        return job
@@ -0,0 +1,194 @@
+import os
+
+import numpy as np
+import pandas as pd
+from instrumentation import stage
+
+try:
+    import pyarrow  # noqa: F401
+    csv_engine = 'pyarrow'
+except ImportError:
+    csv_engine = 'c'
+
+identifier_column = 'college code'
+
+# Text columns repeated on every course row of a college; stored as
+# categoricals so each distinct value is held once.
+categorical_columns = ['category', 'autonomous status', 'co.ed status', 'district', 'college name', 'course']
+
+# Intermediate formats by file extension. Parquet and Feather keep full
+# float64 precision, unlike the 4-decimal CSVs, and need pyarrow.
+intermediate_formats = {'csv': '.csv', 'parquet': '.parquet', 'feather': '.feather'}
+format_extensions = {'.parquet': 'parquet', '.feather': 'feather', '.arrow': 'feather'}
+
+
+def _normalize(name):
+    return name.strip().lower()
+
+
+def normalize_columns(columns, keep_case=()):
+    # Headers are lowercased, but in files that already went through the
+    # 92.5/7.5 split the computed columns listed in keep_case (e.g. 'OC'
+    # next to an uploaded 'oc') keep their case.
+    lowered = [_normalize(name) for name in columns]
+    if 'general' not in lowered:
+        return lowered
+    return [name.strip() if name.strip() in keep_case else lower for name, lower in zip(columns, lowered)]
+
+
+def _as_int32(series):
+    values = pd.to_numeric(series, errors='coerce')
+    if values.notna().all() and (values % 1 == 0).all():
+        return values.astype('int32')
+    return None
+
+
+def source_format(source):
+    name = source if isinstance(source, str) else getattr(source, 'filename', None) or getattr(source, 'name', '')
+    return format_extensions.get(os.path.splitext(str(name))[1].lower(), 'csv')
+
+
+def read_frame(source, file_format=None):
+    """Read a CSV, Parquet or Feather/Arrow IPC file as it is, chosen by extension unless given."""
+    file_format = file_format or source_format(source)
+    if file_format == 'parquet':
+        return pd.read_parquet(source)
+    if file_format == 'feather':
+        if isinstance(source, str):
+            from pyarrow import feather
+            return feather.read_table(source, memory_map=True).to_pandas()
+        return pd.read_feather(source)
+    return pd.read_csv(source, engine=csv_engine)
+
+
+def save_frame(df, output_base, output_format='csv', float_format="%.4f"):
+    """Write df to output_base plus the format's extension, or into output_base if it is a binary file object.
+
+    ``float_format`` applies to CSV only (None writes floats in full).
+    """
+    if output_format not in intermediate_formats:
+        raise ValueError(f"Unknown output format: {output_format}")
+    output_file = output_base if hasattr(output_base, 'write') else output_base + intermediate_formats[output_format]
+    if output_format == 'parquet':
+        df.to_parquet(output_file, index=False)
+    elif output_format == 'feather':
+        df.reset_index(drop=True).to_feather(output_file)
+    else:
+        df.to_csv(output_file, index=False, float_format=float_format)
+    return output_file
+
+
+def load_seat_matrix(source, validate_total=True, keep_case=()):
+    """Read a seat matrix (CSV, Parquet or Feather) with normalized headers and a compact schema.
+
+    Headers are stripped and lowercased, the repeated text columns become
+    categoricals and college code / total become int32 where every row holds
+    an integer (uploads that still carry "<code> Total" rows keep the code as
+    a categorical).
+    """
+    if isinstance(source, str) and not os.path.exists(source):
+        raise FileNotFoundError(f"Error: The file '{source}' was not found.")
+
+    with stage('read') as timed:
+        if source_format(source) == 'csv':
+            seekable = hasattr(source, 'seek')
+            header = pd.read_csv(source, nrows=0).columns
+            if seekable:
+                source.seek(0)
+            dtype = {column: 'category' for column in header if _normalize(column) in categorical_columns}
+            df = pd.read_csv(source, dtype=dtype, engine=csv_engine)
+            df.columns = normalize_columns(df.columns, keep_case)
+        else:
+            df = read_frame(source)
+            df.columns = normalize_columns(df.columns, keep_case)
+            for column in categorical_columns:
+                if column in df.columns:
+                    df[column] = df[column].astype('category')
+        timed.rows = len(df)
+
+    return _finish(df, validate_total)
+
+
+def _finish(df, validate_total):
+    if 'total' not in df.columns:
+        raise ValueError("Error: The CSV file must contain a 'total' column.")
+
+    total = pd.to_numeric(df['total'], errors='coerce')
+    if validate_total and total.isnull().any():
+        raise ValueError("Error: 'total' column contains non-numeric values or missing data.")
+    total_int = _as_int32(total)
+    df['total'] = total if total_int is None else total_int
+
+    if identifier_column in df.columns:
+        codes = _as_int32(df[identifier_column])
+        df[identifier_column] = codes if codes is not None else df[identifier_column].astype('category')
+
+    return df
+
+
+def _course_codes(rows):
+    # Positions and college codes of the course rows; subtotal, Grand Total
+    # and blank-code rows (see pipeline.drop_total_rows) are left out.
+    codes = rows[identifier_column].astype(str)
+    course = (~codes.str.contains("Total", case=False, na=False) & ~codes.isin(["nan", ""])
+              & rows[identifier_column].notna()).to_numpy()
+    return np.flatnonzero(course), codes.to_numpy()[course]
+
+
+def iter_seat_matrix(source, chunk_rows=100000, validate_total=True, keep_case=()):
+    """Read a CSV seat matrix in chunks of roughly ``chunk_rows`` rows.
+
+    A chunk never ends inside a college: the trailing rows of the last
+    college code in each read are held back and start the next chunk, so
+    every college's course rows arrive together.  A college code that shows
+    up again after its rows were handed out raises ValueError, since the
+    matrix then is not grouped by college.  Subtotal and Grand Total rows
+    (a processed matrix read back) do not count as colleges.
+    """
+    if source_format(source) != 'csv':
+        raise ValueError("Error: Chunked reading needs a CSV file.")
+    if isinstance(source, str) and not os.path.exists(source):
+        raise FileNotFoundError(f"Error: The file '{source}' was not found.")
+
+    seekable = hasattr(source, 'seek')
+    header = pd.read_csv(source, nrows=0).columns
+    if seekable:
+        source.seek(0)
+    dtype = {column: 'category' for column in header if _normalize(column) in categorical_columns}
+
+    seen = set()
+
+    def complete(rows):
+        if identifier_column in rows.columns:
+            codes = set(_course_codes(rows)[1])
+            repeated = seen & codes
+            if repeated:
+                raise ValueError(f"Error: College code {min(repeated)} appears in more than one place; "
+                                 "sort the matrix by college code to read it in chunks.")
+            seen.update(codes)
+        return rows
+
+    pending = None
+    carry = None
+    for chunk in pd.read_csv(source, dtype=dtype, chunksize=chunk_rows):
+        chunk.columns = normalize_columns(chunk.columns, keep_case)
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        split = len(chunk)
+        if identifier_column in chunk.columns:
+            # Split before the first course row of the last college, so a
+            # college's subtotal row stays with its courses.
+            positions, codes = _course_codes(chunk)
+            boundaries = np.flatnonzero(codes != codes[-1]) if len(codes) else []
+            split = positions[boundaries[-1] + 1] if len(boundaries) else 0
+        if split:
+            if pending is not None:
+                yield _finish(pending, validate_total)
+            pending = complete(chunk.iloc[:split])
+        carry = chunk.iloc[split:]
+
+    parts = [part for part in (pending, carry) if part is not None and len(part)]
+    if carry is not None and len(carry):
+        complete(carry)
+    if parts:
+        yield _finish(pd.concat(parts, ignore_index=True), validate_total)
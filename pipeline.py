@@ -0,0 +1,190 @@
+import pandas as pd
+from apportion import add_rounded_columns, insert_group_totals
+from excel_export import append_frame, write_excel_streaming
+from instrumentation import stage
+from loader import iter_seat_matrix, load_seat_matrix, normalize_columns as normalize_headers, save_frame
+from policy import default_policy
+
+identifier_column = 'college code'
+
+
+def normalize_columns(df, policy=default_policy):
+    df.columns = normalize_headers(df.columns, policy.computed_columns)
+    if 'total' not in df.columns:
+        raise ValueError("The CSV file must contain a 'total' column.")
+    return df
+
+
+def add_computed_columns(df, policy=default_policy):
+    df['total'] = df['total'].astype(float)
+    return policy.add_quota_columns(df)
+
+
+def add_category_columns(df, policy=default_policy):
+    if not set(policy.quota_columns).issubset(df.columns):
+        df = add_computed_columns(df, policy)
+    return policy.add_category_columns(df)
+
+
+def drop_total_rows(df):
+    # Uploaded matrices carry "<code> Total" subtotal rows and a trailing
+    # grand total row with no college code; neither is a course row.
+    codes = df[identifier_column].astype(str)
+    df = df[~codes.str.contains("Total", case=False, na=False) & ~codes.isin(["nan", ""]) & codes.notna()]
+    return df.reset_index(drop=True)
+
+
+def round_grouped(df, policy=default_policy):
+    if not set(policy.category_columns).issubset(df.columns):
+        df = add_category_columns(df, policy)
+    df = drop_total_rows(df)
+    df[identifier_column] = df[identifier_column].astype(str)
+    df = add_rounded_columns(df, policy.category_columns, group_column=identifier_column,
+                             scale=policy.rounding_scale)
+    return insert_group_totals(df, identifier_column)
+
+
+def _category_column(df, category):
+    # Matrices uploaded with their own lowercase category split take
+    # precedence over the computed uppercase columns, as in process4.
+    return category.lower() if category.lower() in df.columns else category
+
+
+def add_summary_columns(df, policy=default_policy):
+    quota_categories = {quota: [_category_column(df, column) for column in policy.quota_categories(quota)]
+                        for quota in policy.quota_columns}
+    required_columns = set(policy.quota_columns) | {"total"} | {
+        column for columns in quota_categories.values() for column in columns}
+
+    if not required_columns.issubset(df.columns):
+        raise ValueError(f"Missing required columns: {required_columns - set(df.columns)}")
+
+    df["+".join(policy.quota_columns)] = sum(df[column] for column in policy.quota_columns)
+    for quota, columns in quota_categories.items():
+        df[f"{quota.title()} Sum"] = df[columns].sum(axis=1)
+    return df
+
+
+# Stages in the order they always run; a pipeline is any subset of them.
+pipeline_stages = {
+    'computed': add_computed_columns,
+    'categories': add_category_columns,
+    'rounded': round_grouped,
+    'excel': add_summary_columns,
+}
+
+
+def course_totals(df):
+    # Numeric column sums over the course rows, subtotal rows left out.
+    return df[df[identifier_column] != "Total"].select_dtypes(include='number').sum()
+
+
+def grand_total_row(sums, frame):
+    """The Grand Total row closing ``frame``: ``sums`` in its numeric columns, the rest empty."""
+    final_total = dict.fromkeys(frame.columns, "")
+    for column, total in sums.items():
+        final_total[column] = int(total) if pd.api.types.is_integer_dtype(frame[column]) else float(total)
+    final_total[identifier_column] = "Grand Total"
+    return pd.DataFrame([final_total], columns=frame.columns)
+
+
+def run_pipeline(df, stages, progress=None, policy=default_policy, grand_total=True):
+    """Run the selected stages on df in order.
+
+    With the 'rounded' stage the result closes with a Grand Total row of the
+    course rows, as the chunked mode writes it (``grand_total=False`` leaves
+    it out, for one chunk of many).
+    """
+    unknown = set(stages) - set(pipeline_stages)
+    if unknown:
+        raise ValueError(f"Unknown pipeline stages: {unknown}")
+    if not stages:
+        raise ValueError("No pipeline stages selected.")
+
+    df = normalize_columns(df, policy)
+    for name, stage_fn in pipeline_stages.items():
+        if name in stages:
+            if progress:
+                progress(name, len(df))
+            with stage(name) as timed:
+                df = stage_fn(df, policy)
+                timed.rows = len(df)
+    if grand_total and 'rounded' in stages:
+        df = pd.concat([df, grand_total_row(course_totals(df), df)], ignore_index=True)
+    return df
+
+
+def write_excel(df, output_file, policy=default_policy):
+    return write_excel_streaming(df, output_file, policy=policy)
+
+
+def write_output(df, output_base, stages, output_format='csv', policy=default_policy):
+    # output_base may also be a binary file object to write into.
+    with stage('write_xlsx' if 'excel' in stages else f'write_{output_format}') as timed:
+        timed.rows = len(df)
+        if 'excel' in stages:
+            return write_excel(df, output_base if hasattr(output_base, 'write') else f"{output_base}.xlsx", policy)
+        return save_frame(df, output_base, output_format)
+
+
+def run_pipeline_file(input_file, output_base, stages, progress=None, output_format='csv', policy=default_policy):
+    """Run the selected stages on one upload and write only the final artifact."""
+    df = run_pipeline(load_seat_matrix(input_file, keep_case=policy.computed_columns), stages, progress, policy)
+    if progress:
+        progress('writing', len(df))
+    return write_output(df, output_base, stages, output_format, policy)
+
+
+def run_pipeline_chunked(input_file, output_base, stages, output_format='csv', chunk_rows=100000, progress=None,
+                         policy=default_policy):
+    """Run the selected stages on a CSV chunk by chunk, appending each chunk to the output.
+
+    Chunks are split between colleges (see loader.iter_seat_matrix), so the
+    grouped rounding is the same as on the whole file, but colleges are only
+    sorted within a chunk.  Only the current chunk and, with the 'rounded'
+    stage, the running Grand Total of the course rows are kept in memory; the
+    Grand Total row closes the output.  ``progress('chunk', rows)`` is called
+    with the number of input rows done after every chunk.
+    """
+    if 'excel' not in stages and output_format != 'csv':
+        raise ValueError("Chunked processing writes CSV or XLSX output only.")
+    output_file = f"{output_base}.xlsx" if 'excel' in stages else f"{output_base}.csv"
+    ws = None
+    if 'excel' in stages:
+        from openpyxl import Workbook
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet()
+
+    columns = None
+    grand_total = None
+    rows_done = 0
+    for chunk in iter_seat_matrix(input_file, chunk_rows, keep_case=policy.computed_columns):
+        rows_done += len(chunk)
+        df = run_pipeline(chunk, stages, policy=policy, grand_total=False)
+        with stage('write_xlsx' if ws is not None else 'write_csv') as timed:
+            timed.rows = len(df)
+            if ws is not None:
+                if columns is None:
+                    ws.append(df.columns.tolist())
+                append_frame(ws, df, policy=policy)
+            else:
+                df.to_csv(output_file, mode='w' if columns is None else 'a', header=columns is None,
+                          index=False, float_format="%.4f")
+        columns = list(df.columns)
+        if 'rounded' in stages:
+            sums = course_totals(df)
+            grand_total = sums if grand_total is None else grand_total.add(sums, fill_value=0)
+        if progress:
+            progress('chunk', rows_done)
+
+    if columns is None:
+        raise ValueError("Error: The CSV file has no rows.")
+    if grand_total is not None:
+        final_row = grand_total_row(grand_total, df)
+        if ws is not None:
+            append_frame(ws, final_row, policy=policy)
+        else:
+            final_row.to_csv(output_file, mode='a', header=False, index=False, float_format="%.4f")
+    if ws is not None:
+        wb.save(output_file)
+    return output_file
@@ -0,0 +1,176 @@
+import json
+import os
+
+import numpy as np
+
+
+def _decimal_places(share, limit=9):
+    for places in range(limit + 1):
+        scaled = share * 10 ** places
+        if abs(scaled - round(scaled)) < 1e-9 * max(1, scaled):
+            return places
+    raise ValueError(f"Share {share} has more than {limit} decimal places.")
+
+
+class Policy:
+    """A reservation policy: how a course's intake splits into quotas and categories.
+
+    ``quotas`` is a list of (column, share, suffix): the intake is split
+    into one column per quota (e.g. 'general' at 92.5%), and every quota is
+    divided among ``categories`` (name -> share) into '<category><suffix>'
+    columns.  ``column_order`` is the category order used by reports.
+
+    The category shares are compiled into a coefficient matrix with one row
+    per quota, so every category column comes out of a single matrix
+    multiply of the quota columns.
+
+    With ``exact`` the Rounded_/Difference_ columns are computed in integer
+    arithmetic on values scaled by ``scale`` (10 ** the decimal places of
+    the quota plus the category shares, 10**6 for per-mille shares).
+    """
+
+    def __init__(self, quotas, categories, column_order=None, name="default", exact=False):
+        self.name = name
+        self.exact = bool(exact)
+        self.quotas = [(column, float(share), suffix) for column, share, suffix in quotas]
+        self.categories = {category: float(share) for category, share in categories.items()}
+        self.column_order = list(column_order or self.categories)
+
+        for label, shares in (('Quota', [share for _, share, _ in self.quotas]),
+                              ('Category', list(self.categories.values()))):
+            if not shares or min(shares) < 0 or not np.isclose(sum(shares), 1.0):
+                raise ValueError(f"{label} shares of policy '{name}' must be non-negative and add up to 1.")
+        if len({suffix for _, _, suffix in self.quotas}) != len(self.quotas):
+            raise ValueError(f"Every quota of policy '{name}' needs its own column suffix.")
+        if sorted(self.column_order) != sorted(self.categories):
+            raise ValueError(f"column_order of policy '{name}' must list every category once.")
+
+        self.quota_columns = [column for column, _, _ in self.quotas]
+        self.suffixes = {column: suffix for column, _, suffix in self.quotas}
+
+        # Category columns in the order they are added: every quota of a
+        # category next to each other (OC, OC_7.5, BC, BC_7.5, ...).
+        self.category_names = [f"{category}{suffix}" for category in self.categories for _, _, suffix in self.quotas]
+        self.coefficients = np.zeros((len(self.quotas), len(self.category_names)))
+        for j, share in enumerate(self.categories.values()):
+            for i in range(len(self.quotas)):
+                self.coefficients[i, j * len(self.quotas) + i] = share
+
+        # The same columns grouped by quota (OC ... ST, OC_7.5 ... ST_7.5).
+        self.category_columns = [f"{category}{suffix}" for _, _, suffix in self.quotas for category in self.categories]
+
+        if self.exact:
+            self.scale  # raises for shares with too many decimal places
+
+    @property
+    def scale(self):
+        # Every seat total times a quota share times a category share is a
+        # whole multiple of 1/scale.
+        places = max(_decimal_places(share) for _, share, _ in self.quotas) + max(map(_decimal_places, self.categories.values()))
+        return 10 ** places
+
+    @property
+    def rounding_scale(self):
+        """scale in exact mode, None for float rounding (see apportion.add_rounded_columns)."""
+        return self.scale if self.exact else None
+
+    def quota_categories(self, quota_column):
+        return [f"{category}{self.suffixes[quota_column]}" for category in self.categories]
+
+    @property
+    def computed_columns(self):
+        # Columns the processing adds; they keep their case when an
+        # intermediate file is read back in.
+        return set(
+            self.category_columns
+            + [f"{prefix}_{column}" for prefix in ('Rounded', 'Difference') for column in self.category_columns]
+            + [f"{column.title()} Sum" for column in self.quota_columns]
+        )
+
+    def add_quota_columns(self, df):
+        # One column at a time, so each is exactly total * share.
+        for column, share, _ in self.quotas:
+            df[column] = df['total'] * share
+        return df
+
+    def add_category_columns(self, df, by_quota=False):
+        """Add every category column from the quota columns in one matrix multiply.
+
+        Each coefficient row has a single non-zero share per column, so the
+        result is bit for bit quota * share.  With ``by_quota`` the columns
+        are added grouped by quota instead of by category.
+        """
+        values = df[self.quota_columns].to_numpy(dtype=float) @ self.coefficients
+        names = self.category_names
+        if by_quota:
+            order = [names.index(name) for name in self.category_columns]
+            values, names = values[:, order], self.category_columns
+        # Column by column: uploads may already carry duplicate (lowercased)
+        # headers, which a multi-column assignment refuses.
+        for i, name in enumerate(names):
+            df[name] = values[:, i]
+        return df
+
+    def variant(self, name, quotas=None, categories=None):
+        """A copy of this policy with some quota shares (by column) and category shares replaced."""
+        quotas = dict(quotas or {})
+        unknown = set(quotas) - set(self.quota_columns)
+        if unknown:
+            raise ValueError(f"Unknown quotas in policy '{name}': {sorted(unknown)}")
+        categories = {**self.categories, **(categories or {})}
+        return Policy(
+            [(column, quotas.get(column, share), suffix) for column, share, suffix in self.quotas],
+            categories,
+            self.column_order + [category for category in categories if category not in self.categories],
+            name,
+            self.exact,
+        )
+
+    def as_exact(self):
+        """This policy with exact rounding (see ``exact``), e.g. for a --exact flag."""
+        return Policy(self.quotas, self.categories, self.column_order, self.name, exact=True)
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'quotas': [{'column': column, 'share': share, 'suffix': suffix} for column, share, suffix in self.quotas],
+            'categories': self.categories,
+            'column_order': self.column_order,
+            'exact': self.exact,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        quotas = [(quota['column'], quota['share'], quota.get('suffix', "")) for quota in data['quotas']]
+        return cls(quotas, data['categories'], data.get('column_order'), data.get('name', "custom"),
+                   data.get('exact', False))
+
+    @classmethod
+    def from_file(cls, path):
+        """Load a policy from a JSON or YAML file with the keys of to_dict().
+
+        A YAML policy looks like::
+
+            name: tn-engineering
+            quotas:
+              - {column: general, share: 0.925}
+              - {column: 7.5% reservation, share: 0.075, suffix: _7.5}
+            categories: {OC: 0.31, BC: 0.265, BCM: 0.035, MBC: 0.20, SC: 0.15, SCA: 0.03, ST: 0.01}
+            column_order: [OC, BC, BCM, MBC, SCA, SC, ST]
+            exact: true
+        """
+        with open(path) as f:
+            if os.path.splitext(path)[1].lower() in ('.yaml', '.yml'):
+                import yaml
+                data = yaml.safe_load(f)
+            else:
+                data = json.load(f)
+        data.setdefault('name', os.path.splitext(os.path.basename(path))[0])
+        return cls.from_dict(data)
+
+
+default_policy = Policy(
+    quotas=[('general', 0.925, ""), ('7.5% reservation', 0.075, "_7.5")],
+    categories={'OC': 0.31, 'BC': 0.265, 'BCM': 0.035, 'MBC': 0.20, 'SC': 0.15, 'SCA': 0.03, 'ST': 0.01},
+    column_order=['OC', 'BC', 'BCM', 'MBC', 'SCA', 'SC', 'ST'],
+)
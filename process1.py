@@ -1,28 +1,22 @@
-import pandas as pd
+import os
+from loader import load_seat_matrix, save_frame
+from policy import default_policy
 
-def add_computed_columns(csv_file):
-    # Load the CSV file
-    df = pd.read_csv(csv_file)
-
-    # Standardize column names to lowercase
-    df.columns = df.columns.str.strip().str.lower()  
-
-    # Check if 'total' column exists
-    if 'total' not in df.columns:
-        raise ValueError(f"The CSV file must contain a 'total' column. Found columns: {df.columns}")
+def add_computed_columns(csv_file, policy=default_policy, output_format='csv'):
+    # Load the CSV file (lowercase headers, 'total' column validated)
+    df = load_seat_matrix(csv_file)
 
     # Ensure 'total' column contains numerical values
     df['total'] = df['total'].astype(float)  
 
-    # Compute new columns (preserving float values)
-    df['general'] = df['total'] * 0.925
-    df['7.5% reservation'] = df['total'] * 0.075
+    # Compute the quota columns (preserving float values)
+    df = policy.add_quota_columns(df)
 
-    # Save the modified CSV
-    output_file = "1_" + csv_file
-    df.to_csv(output_file, index=False)
-    print(f"Modified CSV saved as {output_file}")
+    # Save the modified file (CSV, or full precision Parquet/Feather)
+    output_file = save_frame(df, "1_" + os.path.splitext(csv_file)[0], output_format, float_format=None)
+    print(f"Modified file saved as {output_file}")
 
 # Example usage
-csv_filename = "govtreserved.csv"  # Replace with your actual file
-add_computed_columns(csv_filename)
+if __name__ == '__main__':
+    csv_filename = "govtreserved.csv"  # Replace with your actual file
+    add_computed_columns(csv_filename)
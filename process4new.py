@@ -1,139 +1,205 @@
-import csv
-import pandas as pd
-
-def round_to_sum(values):
-    original_sum = round(sum(values))
-    floored_values = [int(v) for v in values]
-    floored_sum = sum(floored_values)
-    difference = original_sum - floored_sum
-
-    remainders = sorted(enumerate(values), key=lambda x: x[1] - floored_values[x[0]], reverse=True)
-
-    for i in range(difference):
-        floored_values[remainders[i][0]] += 1
+import argparse
+import operator
+from functools import reduce
+from itertools import chain
 
-    return floored_values
-
-category_percentages = {
-    'OC': 0.31, 
-    'BC': 0.265, 
-    'BCM': 0.035, 
-    'MBC': 0.20,
-    'SCA': 0.03, 
-    'SC': 0.15, 
-    'ST': 0.01
-}
+import numpy as np
+import pandas as pd
+from loader import iter_seat_matrix, load_seat_matrix
+from apportion import add_rounded_columns, append_grand_total, insert_group_totals
+from excel_report import write_report
+from incremental import update_grouped
+from pipeline import grand_total_row
+from policy import Policy, default_policy
 
-def process_csv(input_file, output_file, categories):
-    df = pd.read_csv(input_file)
-    df.columns = df.columns.str.strip().str.lower()
+category_percentages = default_policy.categories
 
-    if 'total' not in df.columns:
-        raise ValueError("The CSV file must contain a 'total' column.")
+identifier_column = 'college code'
 
-    identifier_column = 'college code'
+def clean_rows(df, first=True, last=True):
+    # first/last say whether df starts/ends the matrix; a chunk in the
+    # middle of it keeps no Total rows at either end.
     df[identifier_column] = df[identifier_column].astype(str)
 
     total_rows = df[df[identifier_column].str.contains("Total", case=False, na=False)].index
-    to_drop = [idx for idx in total_rows if idx > 0 and idx < len(df) - 1]
+    to_drop = [idx for idx in total_rows if (idx > 0 or not first) and (idx < len(df) - 1 or not last)]
     df = df.drop(index=to_drop)
 
-    if df[identifier_column].iloc[-1] in ["nan", "", None]:
+    if last and df[identifier_column].iloc[-1] in ["nan", "", None]:
         df = df.iloc[:-1]
+    return df
+
+def _all_castes_column(suffix, kind):
+    # The layout's own spelling: 'ALL CASTE TOTAL_INTEGER-VALUE' next to
+    # 'ALL CASTES TOTAL_DECIMAL-VALUE' and 'ALL CASTES_7.5 TOTAL_INTEGER-VALUE'.
+    prefix = "ALL CASTE" if kind == 'INTEGER' and not suffix else "ALL CASTES"
+    return f"{prefix}{suffix} TOTAL_{kind}-VALUE"
 
+def all_castes_columns(policy=default_policy, kind='INTEGER'):
+    # Per-quota 'ALL CASTES' total columns, then their sum across quotas.
+    columns = [_all_castes_column(suffix, kind) for suffix in policy.suffixes.values()]
+    return columns + ["+".join(columns)] if len(columns) > 1 else columns
+
+def _add(df, columns):
+    # Left to right, as a + b + ... on the columns.
+    return reduce(operator.add, (df[column] for column in columns))
+
+def compute_rows(df, categories, policy=default_policy, rounded=None):
+    # rounded: Rounded_ values already known (see add_rounded_columns).
     df['total'] = df['total'].astype(float)
-    df['general'] = df['total'] * 0.925
-    df['7.5% reservation'] = df['total'] * 0.075
-
-    for cat, perc in category_percentages.items():
-        df[cat] = df['general'] * perc
-        df[f'{cat}_7.5'] = df['7.5% reservation'] * perc
-
-    grouped = df.groupby(identifier_column)
-    adjusted_frames = []
-    round_columns = categories + [f"{cat}_7.5" for cat in categories]
-    for _, group in grouped:
-        adjusted_group = group.copy()
-        for column_name in round_columns:
-            if column_name in adjusted_group.columns:
-                values = adjusted_group[column_name].tolist()
-                adjusted_values = round_to_sum(values)
-                adjusted_group[f'Rounded_{column_name}'] = adjusted_values
-                adjusted_group[f'Difference_{column_name}'] = [
-                    round(adjusted - original, 2)
-                    for adjusted, original in zip(adjusted_values, values)
-                ]
-        adjusted_frames.append(adjusted_group)
-
-    df = pd.concat(adjusted_frames, ignore_index=True)
+    df = policy.add_category_columns(policy.add_quota_columns(df))
+
+    suffixes = list(policy.suffixes.values())
+    round_columns = [f"{cat}{suffix}" for suffix in suffixes for cat in categories]
+    df = add_rounded_columns(df, round_columns, group_column=identifier_column, scale=policy.rounding_scale,
+                             rounded=rounded)
     df = df.loc[:, ~df.columns.duplicated()].dropna(axis=1, how='all')
 
-    for cat in categories:
-        df[f'Rounded_{cat}+Rounded_{cat}_7.5'] = df[f'Rounded_{cat}'] + df[f'Rounded_{cat}_7.5']
-        df[f'Difference_{cat}+Difference_{cat}_7.5'] = df[f'Difference_{cat}'] + df[f'Difference_{cat}_7.5']
-        df[f'{cat}+{cat}_7.5'] = df[cat] + df[f'{cat}_7.5']
-
-    all_castes = list(categories)
-    all_castes_7_5 = [f"{cat}_7.5" for cat in categories]
-    all_castes_rounded = [f"Rounded_{cat}" for cat in categories]
-    all_castes_rounded_7_5 = [f"Rounded_{cat}_7.5" for cat in categories]
-
-    df['ALL CASTES TOTAL_DECIMAL-VALUE'] = df[all_castes].sum(axis=1)
-    df['ALL CASTES_7.5 TOTAL_DECIMAL-VALUE'] = df[all_castes_7_5].sum(axis=1)
-    df['ALL CASTES TOTAL_DECIMAL-VALUE+ALL CASTES_7.5 TOTAL_DECIMAL-VALUE'] = (
-        df['ALL CASTES TOTAL_DECIMAL-VALUE'] + df['ALL CASTES_7.5 TOTAL_DECIMAL-VALUE']
-    )
-    df['ALL CASTE TOTAL_INTEGER-VALUE'] = df[all_castes_rounded].sum(axis=1)
-    df['ALL CASTES_7.5 TOTAL_INTEGER-VALUE'] = df[all_castes_rounded_7_5].sum(axis=1)
-    df['ALL CASTE TOTAL_INTEGER-VALUE+ALL CASTES_7.5 TOTAL_INTEGER-VALUE'] = (
-        df['ALL CASTE TOTAL_INTEGER-VALUE'] + df['ALL CASTES_7.5 TOTAL_INTEGER-VALUE']
-    )
+    # Every category summed across the quotas, e.g. 'Rounded_OC+Rounded_OC_7.5'.
+    combined = len(suffixes) > 1
+    if combined:
+        for cat in categories:
+            for prefix in ('Rounded_', 'Difference_', ''):
+                columns = [f"{prefix}{cat}{suffix}" for suffix in suffixes]
+                df["+".join(columns)] = _add(df, columns)
+
+    for kind, prefix in (('DECIMAL', ''), ('INTEGER', 'Rounded_')):
+        names = all_castes_columns(policy, kind)
+        for name, suffix in zip(names, suffixes):
+            df[name] = df[[f"{prefix}{cat}{suffix}" for cat in categories]].sum(axis=1)
+        if combined:
+            df[names[-1]] = _add(df, names[:-1])
 
     new_column_order = [
         identifier_column, 'category', 'autonomous status', 'co.ed status',
-        'district', 'college name', 'course', 'total', 'general', '7.5% reservation'
+        'district', 'college name', 'course', 'total', *policy.quota_columns
     ]
 
-    ordered_categories = ['OC', 'BC', 'BCM', 'MBC', 'SCA', 'SC', 'ST']
-    for cat in ordered_categories:
-        new_column_order.extend([
-            cat, f'Rounded_{cat}', f'Difference_{cat}', f'{cat}_7.5', f'Rounded_{cat}_7.5',
-            f'Difference_{cat}_7.5', f'Rounded_{cat}+Rounded_{cat}_7.5',
-            f'Difference_{cat}+Difference_{cat}_7.5', f'{cat}+{cat}_7.5'
-        ])
-
-    new_column_order += [
-        'ALL CASTES TOTAL_DECIMAL-VALUE',
-        'ALL CASTES_7.5 TOTAL_DECIMAL-VALUE',
-        'ALL CASTES TOTAL_DECIMAL-VALUE+ALL CASTES_7.5 TOTAL_DECIMAL-VALUE',
-        'ALL CASTE TOTAL_INTEGER-VALUE',
-        'ALL CASTES_7.5 TOTAL_INTEGER-VALUE',
-        'ALL CASTE TOTAL_INTEGER-VALUE+ALL CASTES_7.5 TOTAL_INTEGER-VALUE'
-    ]
+    for cat in policy.column_order:
+        for suffix in suffixes:
+            new_column_order.extend([f'{cat}{suffix}', f'Rounded_{cat}{suffix}', f'Difference_{cat}{suffix}'])
+        if combined:
+            new_column_order.extend("+".join(f"{prefix}{cat}{suffix}" for suffix in suffixes)
+                                    for prefix in ('Rounded_', 'Difference_', ''))
 
-    df = df[new_column_order]
+    new_column_order += all_castes_columns(policy, 'DECIMAL') + all_castes_columns(policy, 'INTEGER')
 
-    new_rows = []
-    for _, group in df.groupby(identifier_column):
-        new_rows.append(group)
-        total_row = group.sum(numeric_only=True)
-        total_row[identifier_column] = "Total"
-        new_rows.append(pd.DataFrame([total_row]))
+    return df[new_column_order]
 
-    df = pd.concat(new_rows, ignore_index=True)
+def add_totals(df):
+    # Subtotal rows after every college and the Grand Total row, on rows
+    # from compute_rows.
+    df = insert_group_totals(df, identifier_column)
     df = df.iloc[:-3]
+    return append_grand_total(df, identifier_column)
 
-    final_total = {}
-    for col in df.columns:
-        if pd.api.types.is_numeric_dtype(df[col]):
-            final_total[col] = df[col].sum()
-        else:
-            final_total[col] = ""
-    final_total[identifier_column] = "Grand Total"
-    df = pd.concat([df, pd.DataFrame([final_total])], ignore_index=True)
+def build_layout(df, categories, policy=default_policy):
+    return add_totals(compute_rows(clean_rows(df), categories, policy))
 
+def process_csv(input_file, output_file, categories, policy=default_policy):
+    df = build_layout(load_seat_matrix(input_file), categories, policy)
     df.to_csv(output_file, index=False, float_format="%.4f")
     print(f"Processed CSV saved as {output_file}")
 
-# Example usage:
-process_csv("1322233112output.csv", "13222222331aa34512output.csv", list(category_percentages.keys()))
\ No newline at end of file
+def process_csv_chunked(input_file, output_file, categories, policy=default_policy, chunk_rows=100000):
+    # process_csv for matrices too large to hold at once: the layout is built
+    # and written one chunk of whole colleges (see loader.iter_seat_matrix)
+    # at a time, keeping only the running grand total. Colleges are sorted
+    # within a chunk, not across the file, so the output matches process_csv
+    # when the matrix is already sorted by college code, except that the
+    # grand total, summed chunk by chunk, can differ in the last decimal
+    # place. Each chunk is written once the next is read, so the last one
+    # can lose its final three rows as in build_layout.
+    def layout(chunk, first, last):
+        df = compute_rows(clean_rows(chunk.reset_index(drop=True), first, last), categories, policy)
+        df = insert_group_totals(df, identifier_column)
+        return df.iloc[:-3] if last else df
+
+    pending = None
+    grand_total = None
+    for chunk in chain(iter_seat_matrix(input_file, chunk_rows), [None]):
+        if pending is not None:
+            df = layout(pending, grand_total is None, chunk is None)
+            df.to_csv(output_file, mode='w' if grand_total is None else 'a', header=grand_total is None,
+                      index=False, float_format="%.4f")
+            sums = df.select_dtypes(include='number').sum()
+            grand_total = sums if grand_total is None else grand_total + sums
+        pending = chunk
+
+    if grand_total is None:
+        raise ValueError("Error: The CSV file has no rows.")
+    grand_total_row(grand_total, df).to_csv(output_file, mode='a', header=False, index=False, float_format="%.4f")
+    print(f"Processed CSV saved as {output_file}")
+
+def process_report(input_file, output_file, categories, policy=default_policy):
+    # Same rows as process_csv, as a formatted XLSX (see excel_report); the
+    # integer total of all castes and quotas is checked against 'total'.
+    df = build_layout(load_seat_matrix(input_file), categories, policy)
+    write_report(df, output_file, integer_checks={all_castes_columns(policy)[-1]: 'total'})
+    print(f"Report saved as {output_file}")
+
+def update_csv(previous_file, input_file, output_file, categories, policy=default_policy):
+    # Only colleges whose rows differ from previous_file (an earlier
+    # process_csv output) are rounded again. Unchanged rows are copied from
+    # previous_file line for line, so the rounding and formatting grow with
+    # the number of changed colleges. The grand total is summed as in a full
+    # run, over the layout rebuilt from input_file with the Rounded_ values
+    # of the patched rows (the 4-decimal CSV values would be off in the last
+    # place), so the output is byte for byte what process_csv writes.
+    with open(previous_file) as f:
+        lines = f.read().splitlines()
+    previous = pd.read_csv(previous_file).iloc[:-1]
+    rows = clean_rows(load_seat_matrix(input_file))
+
+    df, source, changed = update_grouped(previous, rows, lambda changed_rows: compute_rows(changed_rows, categories, policy),
+                                         identifier_column)
+    course = (df[identifier_column].astype(str) != "Total").to_numpy()
+    rounded_columns = [f"Rounded_{cat}{suffix}" for suffix in policy.suffixes.values() for cat in categories]
+    layout = compute_rows(rows.copy(), categories, policy, df.loc[course, rounded_columns].to_numpy(dtype=np.int64))
+    layout = insert_group_totals(layout, identifier_column).iloc[:-3]
+    grand_total = append_grand_total(layout, identifier_column).iloc[-1:]
+
+    df, source = df.iloc[:-3], source[:-3]
+    recomputed = df[source < 0]
+
+    new_lines = pd.concat([recomputed, grand_total]).to_csv(index=False, header=False, float_format="%.4f").splitlines()
+    body = np.empty(len(df), dtype=object)
+    body[source >= 0] = np.asarray(lines[1:], dtype=object)[source[source >= 0]]
+    body[source < 0] = new_lines[:-1]
+    with open(output_file, 'w') as f:
+        f.write("\n".join([lines[0], *body, new_lines[-1]]) + "\n")
+    print(f"Updated CSV saved as {output_file} ({len(changed)} colleges recomputed)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the process4new layout of a seat matrix.")
+    parser.add_argument('input', nargs='?', default="1322233112output.csv")
+    parser.add_argument('output', nargs='?', default="13222222331aa34512output.csv")
+    parser.add_argument('--update', metavar='PREVIOUS',
+                        help="earlier CSV output of this script; only colleges changed since are recomputed")
+    parser.add_argument('--report', action='store_true', help="write a formatted XLSX report instead of CSV")
+    parser.add_argument('--policy', help="JSON/YAML reservation policy file (default: the built-in policy)")
+    parser.add_argument('--exact', action='store_true', help="round in exact integer arithmetic")
+    parser.add_argument('--chunk-rows', type=int, metavar='N',
+                        help="read and write the matrix about N rows at a time (CSV output only)")
+    args = parser.parse_args(argv)
+    if args.update and args.report:
+        parser.error("--update patches a CSV output; it cannot be combined with --report.")
+    if args.chunk_rows and (args.update or args.report):
+        parser.error("--chunk-rows writes a full CSV output; it cannot be combined with --update or --report.")
+
+    policy = Policy.from_file(args.policy) if args.policy else default_policy
+    if args.exact:
+        policy = policy.as_exact()
+    categories = list(policy.categories)
+    if args.update:
+        update_csv(args.update, args.input, args.output, categories, policy)
+    elif args.report:
+        process_report(args.input, args.output, categories, policy)
+    elif args.chunk_rows:
+        process_csv_chunked(args.input, args.output, categories, policy, args.chunk_rows)
+    else:
+        process_csv(args.input, args.output, categories, policy)
+
+# Example usage: python process4new.py input.csv output.csv [--update previous.csv | --chunk-rows 100000]
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,84 @@
+import os
+
+from apportion import add_rounded_columns
+from instrumentation import stage
+from loader import load_seat_matrix, read_frame, save_frame
+from pipeline import add_category_columns, add_summary_columns, run_pipeline_file, write_excel
+from policy import default_policy
+from workers import compiled_policy
+
+
+def save_output(df, output_file, output_format='csv', float_format="%.4f"):
+    # output_file is a binary file object, or a path whose extension makes
+    # way for the format's.
+    with stage(f'write_{output_format}') as timed:
+        timed.rows = len(df)
+        output_base = output_file if hasattr(output_file, 'write') else os.path.splitext(output_file)[0]
+        return save_frame(df, output_base, output_format, float_format)
+
+
+def add_computed_columns(input_file, policy=default_policy, output_file=None, progress=None, output_format='csv'):
+    df = load_seat_matrix(input_file)
+    if progress:
+        progress('computed', len(df))
+    with stage('computed'):
+        df['total'] = df['total'].astype(float)
+        df = policy.add_quota_columns(df)
+    if output_file is None:
+        output_file = os.path.join(os.path.dirname(input_file), "1_" + os.path.basename(input_file))
+    if progress:
+        progress('writing', len(df))
+    return save_output(df, output_file, output_format, float_format=None)
+
+
+def process_csv(input_file, output_file, column_names, policy=default_policy, progress=None, output_format='csv'):
+    df = load_seat_matrix(input_file)
+    if progress:
+        progress('categories', len(df))
+    with stage('categories'):
+        df['total'] = df['total'].astype(float)
+        df = add_category_columns(policy.add_quota_columns(df), policy)
+
+    if progress:
+        progress('rounding', len(df))
+    with stage('rounding'):
+        df = add_rounded_columns(df, column_names, scale=policy.rounding_scale)
+
+    if progress:
+        progress('writing', len(df))
+    return save_output(df, output_file, output_format)
+
+
+def process_csv_to_excel(file_path, output_file, policy=default_policy, progress=None):
+    with stage('read') as timed:
+        df = read_frame(file_path)
+        timed.rows = len(df)
+    if progress:
+        progress('summary', len(df))
+    with stage('summary'):
+        df = add_summary_columns(df, policy)
+    if progress:
+        progress('writing', len(df))
+    with stage('write_xlsx'):
+        return write_excel(df, output_file, policy)
+
+
+# Background job workers unpickle run_process from this module rather than
+# from app, so it must stay free of import-time side effects.
+def run_process(params, file_path, output_path, progress=None):
+    # file_path and output_path may also be file objects: an upload parsed
+    # from memory (with a .name for its format) and a binary output buffer.
+    process_type = params['process_type']
+    streamed = hasattr(output_path, 'write')
+    policy = compiled_policy(params['policy'])
+    if process_type == 'process1':
+        return add_computed_columns(file_path, policy, output_path if streamed else None, progress,
+                                    params['output_format'])
+    elif process_type in ('process2', 'process3'):
+        return process_csv(file_path, output_path, params['column_names'], policy, progress, params['output_format'])
+    elif process_type == 'process4':
+        return process_csv_to_excel(file_path, output_path, policy, progress)
+    elif process_type == 'pipeline':
+        return run_pipeline_file(file_path, output_path if streamed else os.path.splitext(output_path)[0],
+                                 params['stages'], progress,
+                                 params['output_format'], policy)
@@ -0,0 +1,89 @@
+import json
+
+import numpy as np
+import pandas as pd
+from pipeline import drop_total_rows
+
+# Columns with a prebuilt index; lookups ignore case and surrounding spaces.
+index_columns = ['college code', 'district', 'course', 'category']
+
+
+def _key(value):
+    return str(value).strip().casefold()
+
+
+def _number(value):
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+class SeatIndex:
+    """A processed seat matrix held in memory for repeated lookups.
+
+    Subtotal and grand total rows are dropped.  Every index column keeps
+    the row positions of each of its values, so a filter is a few dict
+    lookups and array intersections; sums group by the precomputed integer
+    codes of an index column with np.bincount.
+    """
+
+    def __init__(self, df, source=None):
+        self.frame = drop_total_rows(df)
+        self.source = source
+        self.value_columns = [column for column in self.frame.columns
+                              if column not in index_columns and pd.api.types.is_numeric_dtype(self.frame[column])]
+        self.values = self.frame[self.value_columns].to_numpy(dtype=float)
+
+        self.codes = {}
+        self.labels = {}
+        self.positions = {}
+        for column in index_columns:
+            if column not in self.frame.columns:
+                continue
+            text = self.frame[column].astype(str).fillna("").str.strip()
+            codes, keys = pd.factorize(text.str.casefold(), sort=True)
+            order = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[order], np.arange(len(keys) + 1))
+            self.codes[column] = codes
+            # First spelling of every value, for display.
+            self.labels[column] = text.groupby(codes, sort=True).first().tolist()
+            self.positions[column] = {key: order[bounds[i]:bounds[i + 1]] for i, key in enumerate(keys)}
+
+    def __len__(self):
+        return len(self.frame)
+
+    def select(self, filters):
+        """Sorted positions of the rows matching every filter (column -> list of values)."""
+        positions = None
+        for column, wanted in filters.items():
+            if column not in self.positions:
+                raise ValueError(f"Cannot filter on '{column}'; indexed columns: {list(self.positions)}")
+            index = self.positions[column]
+            matched = np.unique(np.concatenate([index.get(_key(value), np.empty(0, dtype=np.intp)) for value in wanted]))
+            positions = matched if positions is None else np.intersect1d(positions, matched, assume_unique=True)
+        return np.arange(len(self.frame)) if positions is None else positions
+
+    def _value_indexes(self, columns):
+        unknown = [column for column in columns if column not in self.value_columns]
+        if unknown:
+            raise ValueError(f"Unknown value columns: {unknown}")
+        return [self.value_columns.index(column) for column in columns]
+
+    def totals(self, positions, columns, group_by=None):
+        """Sums of ``columns`` over the selected rows, overall or per value of ``group_by``."""
+        values = self.values[np.ix_(positions, self._value_indexes(columns))]
+        if group_by is None:
+            return {column: _number(total) for column, total in zip(columns, values.sum(axis=0))}
+        if group_by not in self.codes:
+            raise ValueError(f"Cannot group by '{group_by}'; indexed columns: {list(self.codes)}")
+
+        codes = self.codes[group_by][positions]
+        labels = self.labels[group_by]
+        present = np.unique(codes)
+        sums = [np.bincount(codes, weights=values[:, i], minlength=len(labels))[present] for i in range(len(columns))]
+        return [
+            {group_by: labels[code], 'rows': int(count), **{column: _number(s[j]) for column, s in zip(columns, sums)}}
+            for j, (code, count) in enumerate(zip(present, np.bincount(codes)[present]))
+        ]
+
+    def records(self, positions, limit=50):
+        return json.loads(self.frame.iloc[positions[:limit]].to_json(orient='records'))
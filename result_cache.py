@@ -0,0 +1,82 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+
+# Part of every key. Bump it with any change to what the processing code
+# writes, so files cached by an older release are not served after a deploy.
+format_version = 1
+
+
+class ResultCache:
+    """Bounded on-disk cache of generated files, keyed by upload content.
+
+    Entries are stored as ``<directory>/<key>``; reading an entry refreshes
+    its modification time, and once the cache holds more than ``max_entries``
+    files or ``max_bytes`` bytes the least recently used entries are removed.
+    """
+
+    def __init__(self, directory, max_entries=256, max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(data, params):
+        digest = hashlib.sha256(f"v{format_version}\0".encode())
+        digest.update(data)
+        digest.update(json.dumps(params, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key, source_file):
+        # Copy under a private name first so readers never see a partial file.
+        # source_file is a path or a binary file object, copied from its start.
+        path = self._path(key)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        if hasattr(source_file, 'read'):
+            source_file.seek(0)
+            with open(tmp_path, 'wb') as f:
+                shutil.copyfileobj(source_file, f)
+        else:
+            shutil.copyfile(source_file, tmp_path)
+        os.replace(tmp_path, path)
+        self._evict(keep=path)
+        return path
+
+    def _evict(self, keep):
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and not entry.name.endswith('.tmp'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            entries.sort()
+
+            total_bytes = sum(size for _, size, _ in entries)
+            count = len(entries)
+            for _, size, path in entries:
+                if count <= self.max_entries and total_bytes <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                count -= 1
+                total_bytes -= size
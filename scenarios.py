@@ -0,0 +1,113 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from apportion import group_offsets, round_to_sum_exact, round_to_sum_matrix, scale_values
+from loader import load_seat_matrix
+from pipeline import drop_total_rows, identifier_column
+from policy import Policy, default_policy
+
+
+def load_scenarios(spec, base=default_policy):
+    """Policies for a scenario spec, the base policy first as 'baseline'.
+
+    ``spec`` is a list (or a dict with a 'scenarios' list) of overrides of
+    ``base``, e.g. ``{'name': 'bc-up', 'categories': {'BC': 0.285, 'MBC':
+    0.18}}`` or ``{'name': 'govt-10', 'quotas': {'general': 0.9, '7.5%
+    reservation': 0.1}}``.
+    """
+    if isinstance(spec, dict):
+        spec = spec.get('scenarios', [])
+    policies = [base.variant('baseline')]
+    for i, scenario in enumerate(spec, start=1):
+        policies.append(base.variant(scenario.get('name', f"scenario_{i}"),
+                                     scenario.get('quotas'), scenario.get('categories')))
+    names = [policy.name for policy in policies]
+    if len(set(names)) != len(names):
+        raise ValueError("Scenario names must be unique.")
+    return policies
+
+
+def read_scenarios(path, base=default_policy):
+    with open(path) as f:
+        if os.path.splitext(path)[1].lower() in ('.yaml', '.yml'):
+            import yaml
+            return load_scenarios(yaml.safe_load(f), base)
+        return load_scenarios(json.load(f), base)
+
+
+def stack_scenarios(total, policies):
+    """Category values of every policy as one scenarios x rows x columns array.
+
+    Columns are the union of the policies' category columns; a column a
+    policy does not have stays 0.
+    """
+    columns = list(dict.fromkeys(column for policy in policies for column in policy.category_columns))
+    values = np.zeros((len(policies), len(total), len(columns)))
+    for s, policy in enumerate(policies):
+        quota_values = total[:, None] * np.array([share for _, share, _ in policy.quotas])
+        values[s][:, [columns.index(name) for name in policy.category_names]] = quota_values @ policy.coefficients
+    return values, columns
+
+
+def round_scenarios(values, starts, scale=None):
+    """Grouped largest-remainder rounding of every scenario and column in one pass.
+
+    With ``scale`` the values are rounded in exact integer arithmetic, as
+    multiples of 1/scale (see apportion.round_to_sum_exact).
+    """
+    n_scenarios, n_rows, n_columns = values.shape
+    flat = values.transpose(1, 0, 2).reshape(n_rows, n_scenarios * n_columns)
+    if scale is None:
+        rounded = round_to_sum_matrix(flat, starts)
+    else:
+        rounded = round_to_sum_exact(scale_values(flat, scale), scale, starts)
+    return rounded.reshape(n_rows, n_scenarios, n_columns).transpose(1, 0, 2)
+
+
+def compare_scenarios(df, policies):
+    """Evaluate every policy on one seat matrix and summarise them side by side.
+
+    One row per scenario: the courses and colleges whose rounded seats
+    differ from the first scenario, the rounded seat total and the rounded
+    total of every category column.
+    """
+    df = drop_total_rows(df)
+    order, starts = group_offsets(df[identifier_column].astype(str))
+    total = df['total'].to_numpy(dtype=float)[order]
+
+    values, columns = stack_scenarios(total, policies)
+    # Exact policies share one scale: the scales are powers of ten, so the
+    # largest is a multiple of all of them.
+    exact = any(policy.exact for policy in policies)
+    rounded = round_scenarios(values, starts, max(policy.scale for policy in policies) if exact else None)
+
+    changed = (rounded != rounded[:1]).any(axis=2)
+    group_of_row = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(total))))
+    report = pd.DataFrame(rounded.sum(axis=1), columns=columns)
+    report.insert(0, 'scenario', [policy.name for policy in policies])
+    report.insert(1, 'changed_courses', changed.sum(axis=1))
+    report.insert(2, 'changed_colleges', [len(np.unique(group_of_row[rows])) for rows in changed])
+    report.insert(3, 'seats', rounded.sum(axis=(1, 2)))
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare reservation scenarios on one seat matrix.")
+    parser.add_argument('input', help="seat matrix (CSV, Parquet or Feather)")
+    parser.add_argument('scenarios', help="JSON/YAML list of policy overrides, one per scenario")
+    parser.add_argument('--policy', help="base policy file (default: the built-in policy)")
+    parser.add_argument('--output', default="scenario_report.csv")
+    args = parser.parse_args(argv)
+
+    base = Policy.from_file(args.policy) if args.policy else default_policy
+    report = compare_scenarios(load_seat_matrix(args.input), read_scenarios(args.scenarios, base))
+    report.to_csv(args.output, index=False)
+    print(report.to_string(index=False))
+    print(f"Report saved as {args.output}")
+
+
+if __name__ == '__main__':
+    main()
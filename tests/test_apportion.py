@@ -0,0 +1,184 @@
+from fractions import Fraction
+from math import floor
+
+import numpy as np
+import pandas as pd
+import pytest
+from apportion import (add_rounded_columns, exact_differences, round_differences, round_to_sum,
+                       round_to_sum_exact, round_to_sum_matrix, scale_values)
+from policy import default_policy
+
+
+def reference_round_to_sum(values):
+    # round_to_sum as process3.py had it before apportion.py.
+    original_sum = round(sum(values))
+    floored_values = [int(v) for v in values]
+    difference = original_sum - sum(floored_values)
+    remainders = [(i, v - floored_values[i]) for i, v in enumerate(values)]
+    remainders.sort(key=lambda x: x[1], reverse=True)
+    for i in range(difference):
+        floored_values[remainders[i][0]] += 1
+    return floored_values
+
+
+def reference_rounded_columns(df, column_names, group_column=None):
+    # The per-group, per-column loops of process3/process3new.
+    groups = [df] if group_column is None else [group for _, group in df.groupby(group_column)]
+    frames = []
+    for group in groups:
+        group = group.copy()
+        for column_name in column_names:
+            values = group[column_name].tolist()
+            adjusted = reference_round_to_sum(values)
+            group[f'Rounded_{column_name}'] = adjusted
+            group[f'Difference_{column_name}'] = [round(a - v, 2) for a, v in zip(adjusted, values)]
+        frames.append(group)
+    return pd.concat(frames, ignore_index=True)
+
+
+def seat_matrix(rng, n_rows, n_colleges):
+    total = rng.integers(0, 240, n_rows).astype(float)
+    df = pd.DataFrame({
+        'college code': rng.integers(1, n_colleges + 1, n_rows).astype(str),
+        'total': total,
+        'general': total * 0.925,
+        '7.5% reservation': total * 0.075,
+    })
+    for category, share in {'OC': 0.31, 'BC': 0.265, 'BCM': 0.035, 'SCA': 0.03}.items():
+        df[category] = df['general'] * share
+        df[f'{category}_7.5'] = df['7.5% reservation'] * share
+    return df
+
+
+def assert_identical(actual, expected):
+    # Bit for bit, including the sign of zero.
+    actual, expected = np.asarray(actual), np.asarray(expected)
+    assert actual.dtype == expected.dtype
+    assert np.array_equal(actual.view(np.uint8), expected.view(np.uint8))
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_round_to_sum_matches_reference(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(0, 60))
+    values = rng.choice([rng.random(n) * 50, rng.integers(0, 40, n) / 8, rng.integers(0, 200, n) * 0.925 * 0.265])
+    assert round_to_sum(list(values)) == reference_round_to_sum(list(values))
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_round_to_sum_matrix_matches_columns(seed):
+    rng = np.random.default_rng(seed)
+    values = rng.integers(0, 400, (50, 6)) * rng.choice([0.925 * 0.31, 0.075 * 0.035, 0.125, 0.5], 6)
+    rounded = round_to_sum_matrix(values)
+    for i in range(values.shape[1]):
+        assert rounded[:, i].tolist() == reference_round_to_sum(values[:, i].tolist())
+
+
+@pytest.mark.parametrize('n_colleges', [1, 3, 40, 400])
+def test_add_rounded_columns_matches_reference(n_colleges):
+    # Few long groups and many short ones take the two ranking paths.
+    rng = np.random.default_rng(n_colleges)
+    df = seat_matrix(rng, 600, n_colleges)
+    columns = ['total', 'OC', 'BC', 'BCM', 'SCA', 'OC_7.5', 'BC_7.5', 'BCM_7.5', 'SCA_7.5']
+    for group_column in (None, 'college code'):
+        expected = reference_rounded_columns(df, columns, group_column)
+        actual = add_rounded_columns(df.copy(), columns, group_column)
+        assert list(actual.columns) == list(expected.columns)
+        for column in expected.columns:
+            if column.startswith(('Rounded_', 'Difference_')):
+                assert_identical(actual[column].to_numpy(), expected[column].to_numpy())
+            else:
+                assert actual[column].tolist() == expected[column].tolist()
+
+
+def test_round_differences_matches_round():
+    rng = np.random.default_rng(0)
+    values = np.concatenate([
+        rng.integers(-10 ** 5, 10 ** 5, 10 ** 4) / 200,  # exact half-way points
+        rng.integers(-10 ** 5, 10 ** 5, 10 ** 4) / 1000 + 0.005,
+        rng.normal(0, 1, 10 ** 4) * 10.0 ** rng.integers(-20, 20, 10 ** 4),
+        [0.0, -0.0, -0.001, 2.675, 1.005, 5e-324, 2.0 ** 53, 1e20, np.inf, -np.inf],
+    ])
+    expected = np.array([round(float(value), 2) for value in values])
+    assert_identical(round_differences(values, np.zeros_like(values)), expected)
+
+
+def reference_round_exact(values):
+    # Largest remainders on Fractions: the target is the sum rounded half to
+    # even and equal remainders go to the earlier row.
+    floored = [floor(v) for v in values]
+    difference = round(sum(values)) - sum(floored)
+    order = sorted(range(len(values)), key=lambda i: (floored[i] - values[i], i))
+    for i in order[:difference]:
+        floored[i] += 1
+    return floored
+
+
+def reference_difference(rounded, value):
+    return float(round(rounded - value, 2))
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_round_to_sum_exact_matches_fractions(seed):
+    rng = np.random.default_rng(seed)
+    scale = default_policy.scale
+    totals = rng.integers(0, 240, (int(rng.integers(1, 60)), 1))
+    shares = [(Fraction("0.925"), Fraction("0.31")), (Fraction("0.075"), Fraction("0.035")),
+              (Fraction("0.925"), Fraction("0.265")), (Fraction("0.075"), Fraction("0.01"))]
+    exact = [[int(total) * quota * category for quota, category in shares] for total in totals[:, 0]]
+    scaled = np.array([[int(value * scale) for value in row] for row in exact], dtype=np.int64)
+
+    rounded = round_to_sum_exact(scaled, scale)
+    differences = exact_differences(rounded, scaled, scale)
+    for i in range(len(shares)):
+        column = [row[i] for row in exact]
+        assert rounded[:, i].tolist() == reference_round_exact(column)
+        assert differences[:, i].tolist() == [reference_difference(r, v) for r, v in zip(rounded[:, i].tolist(), column)]
+
+
+def test_round_to_sum_exact_ties_and_targets():
+    def rounded(values):
+        return round_to_sum_exact(scale_values(values, 100), 100).tolist()
+
+    assert rounded([0.5, 0.5, 0.5]) == [1, 1, 0]  # 1.5 -> 2, ties to the earlier rows
+    assert rounded([0.25, 0.25]) == [0, 0]  # 0.5 -> 0
+    assert rounded([0.75, 0.75]) == [1, 1]  # 1.5 -> 2
+    assert rounded([1.25, 1.25]) == [1, 1]  # 2.5 -> 2
+    assert rounded([0.3, 0.5, 0.5, 0.2]) == [0, 1, 1, 0]
+
+
+def test_exact_differences_round_half_even():
+    values = [Fraction(n, 1000) for n in (5, 15, 125, 135, 145, 2675, 1005)]
+    scaled = np.array([int(value * 1000) for value in values], dtype=np.int64)
+    rounded = np.array([0, 0, 0, 0, 0, 3, 1])
+    expected = [reference_difference(r, v) for r, v in zip(rounded.tolist(), values)]
+    assert exact_differences(rounded, scaled, 1000).tolist() == expected
+    assert expected[:5] == [0.0, -0.02, -0.12, -0.14, -0.14]
+
+
+def test_scale_values_rejects_finer_values():
+    assert scale_values([0.001, 2.5, 0.925 * 0.265], 10 ** 6).tolist() == [1000, 2500000, 245125]
+    with pytest.raises(ValueError):
+        scale_values([0.0005], 1000)
+    with pytest.raises(ValueError):
+        scale_values([1 / 3], 10 ** 6)
+
+
+def test_exact_policy_matches_fractions():
+    policy = default_policy.as_exact()
+    assert policy.exact and not default_policy.exact
+    assert policy.rounding_scale == policy.scale == 10 ** 6
+
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame({'college code': rng.integers(1, 6, 80).astype(str), 'total': rng.integers(0, 240, 80).astype(float)})
+    df = policy.add_category_columns(policy.add_quota_columns(df))
+    actual = add_rounded_columns(df, policy.category_columns, 'college code', policy.rounding_scale)
+
+    for _, group in actual.groupby('college code'):
+        for _, share, suffix in policy.quotas:
+            for category, category_share in policy.categories.items():
+                column = f"{category}{suffix}"
+                exact = [int(total) * Fraction(str(share)) * Fraction(str(category_share)) for total in group['total']]
+                assert group[f"Rounded_{column}"].tolist() == reference_round_exact(exact)
+                assert group[f"Difference_{column}"].tolist() == [
+                    reference_difference(r, v) for r, v in zip(group[f"Rounded_{column}"].tolist(), exact)]
@@ -0,0 +1,54 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+from excel_report import write_report
+
+openpyxl = pytest.importorskip('openpyxl')
+
+
+def sample_frame():
+    return pd.DataFrame({
+        'college code': ['1', '1', '1 Total', 'Grand Total'],
+        'course': ['civil \x0bengineering', ' mech <&> ', None, None],
+        'total': [60.0, 30.0, 90.0, 90.0],
+        'OC': [18.6, 9.3, 27.9, 27.9],
+        'Rounded_OC': [19, 9, 28, 28],
+        'Difference_OC': [0.4, -0.3, 0.1, 0.1],
+        'ALL CASTE TOTAL_INTEGER-VALUE+ALL CASTES_7.5 TOTAL_INTEGER-VALUE': [60, 31, np.nan, 90],
+    })
+
+
+def load(df, **kwargs):
+    output = io.BytesIO()
+    write_report(df, output, **kwargs)
+    output.seek(0)
+    return openpyxl.load_workbook(output).active
+
+
+def test_round_trip_values():
+    df = sample_frame()
+    sheet = load(df)
+    rows = list(sheet.values)
+    assert list(rows[0]) == list(df.columns)
+    assert rows[1][:3] == ('1', 'civil engineering', 60)
+    assert rows[2][1] == ' mech <&> '
+    assert rows[3][1] is None and rows[3][6] is None
+    assert [row[4] for row in rows[1:]] == [19, 9, 28, 28]
+    assert rows[1][3] == pytest.approx(18.6)
+
+
+def test_column_styles_and_highlighting():
+    sheet = load(sample_frame(), sheet_name="Seats\x01")
+    assert sheet.title == "Seats"
+    assert sheet.freeze_panes == "A2"
+    formats = [sheet.cell(row=2, column=column).number_format for column in range(3, 7)]
+    assert formats == ['0', '0.0000', '0', '0.00']
+    ranges = {str(rule.sqref) for rule in sheet.conditional_formatting}
+    assert ranges == {"A2:G5", "F2:F5", "G2:G5"}
+
+
+def test_empty_frame():
+    sheet = load(pd.DataFrame({'college code': [], 'total': []}))
+    assert list(sheet.values) == [('college code', 'total')]
@@ -0,0 +1,40 @@
+import pandas as pd
+import pytest
+from loader import iter_seat_matrix
+
+
+def write_matrix(path, codes):
+    pd.DataFrame({
+        'College Code': codes,
+        'COURSE': [f"course {i}" for i in range(len(codes))],
+        'TOTAL': range(1, len(codes) + 1),
+    }).to_csv(path, index=False)
+    return str(path)
+
+
+def test_chunks_keep_colleges_together(tmp_path):
+    path = write_matrix(tmp_path / "matrix.csv", ['1', '1', '1', '2', '2', '3', '3', '3', '4'])
+    chunks = list(iter_seat_matrix(path, chunk_rows=2))
+    codes = [chunk['college code'].astype(str).tolist() for chunk in chunks]
+    assert sum(codes, []) == ['1', '1', '1', '2', '2', '3', '3', '3', '4']
+    for a, b in zip(codes, codes[1:]):
+        assert not set(a) & set(b)
+
+
+def test_processed_matrix_with_total_rows(tmp_path):
+    # A pipeline output: every college closes with a 'Total' row, the file
+    # with a Grand Total row.
+    codes = ['1', '1', 'Total', '2', '2', '2', 'Total', '3', 'Total', 'Grand Total']
+    path = write_matrix(tmp_path / "processed.csv", codes)
+    chunks = list(iter_seat_matrix(path, chunk_rows=3))
+    rows = [chunk['college code'].astype(str).tolist() for chunk in chunks]
+    assert sum(rows, []) == codes
+    # Each subtotal row stays in the chunk of its college.
+    for chunk in rows:
+        assert chunk[0] not in ('Total', 'Grand Total')
+
+
+def test_repeated_college_raises(tmp_path):
+    path = write_matrix(tmp_path / "unsorted.csv", ['1', '1', '2', '2', '1', '3'])
+    with pytest.raises(ValueError, match="College code 1"):
+        list(iter_seat_matrix(path, chunk_rows=2))
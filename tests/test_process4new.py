@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+import process4new
+from benchmark import synthesize_matrix
+
+categories = list(process4new.category_percentages)
+
+
+def test_chunked_matches_full_run(tmp_path):
+    # College codes 1000.. are sorted as text too, so the chunked and full
+    # layouts hold the same rows in the same order.
+    matrix = tmp_path / "matrix.csv"
+    synthesize_matrix(400, seed=3).to_csv(matrix, index=False)
+    process4new.process_csv(str(matrix), tmp_path / "full.csv", categories)
+    process4new.process_csv_chunked(str(matrix), tmp_path / "chunked.csv", categories, chunk_rows=37)
+
+    full = (tmp_path / "full.csv").read_text().splitlines()
+    chunked = (tmp_path / "chunked.csv").read_text().splitlines()
+    assert chunked[:-1] == full[:-1]
+    full_total = pd.read_csv(tmp_path / "full.csv").iloc[-1, 7:].astype(float)
+    chunked_total = pd.read_csv(tmp_path / "chunked.csv").iloc[-1, 7:].astype(float)
+    np.testing.assert_allclose(chunked_total, full_total, atol=2e-4)
+
+
+def edit_matrix(df, edit):
+    codes = df['College Code']
+    if edit == 'changed':
+        df.loc[codes == codes.iloc[len(df) // 2], 'TOTAL'] += 7
+    elif edit == 'changed_last':
+        df.loc[codes == codes.max(), 'TOTAL'] += 7
+    elif edit == 'removed':
+        df = df[codes != codes.iloc[len(df) // 3]]
+    elif edit == 'removed_last':
+        df = df[codes != codes.max()]
+    elif edit == 'added':
+        # '10000' sorts between '1000' and '1001' as text.
+        df = pd.concat([df, df[codes == codes.min()].assign(**{'College Code': 10000})])
+    elif edit == 'added_last':
+        # '999' sorts after every four-digit code.
+        df = pd.concat([df, df[codes == codes.min()].assign(**{'College Code': 999, 'TOTAL': 61})])
+    return df
+
+
+@pytest.mark.parametrize('edit', ['changed', 'changed_last', 'removed', 'removed_last', 'added', 'added_last'])
+def test_update_matches_full_run(tmp_path, edit):
+    matrix = synthesize_matrix(300, seed=5)
+    matrix.to_csv(tmp_path / "before.csv", index=False)
+    edit_matrix(matrix, edit).to_csv(tmp_path / "after.csv", index=False)
+    process4new.process_csv(str(tmp_path / "before.csv"), tmp_path / "previous.csv", categories)
+
+    process4new.process_csv(str(tmp_path / "after.csv"), tmp_path / "full.csv", categories)
+    process4new.update_csv(tmp_path / "previous.csv", str(tmp_path / "after.csv"), tmp_path / "updated.csv", categories)
+    assert (tmp_path / "updated.csv").read_bytes() == (tmp_path / "full.csv").read_bytes()
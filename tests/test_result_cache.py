@@ -0,0 +1,10 @@
+import result_cache
+from result_cache import ResultCache
+
+
+def test_key_changes_with_format_version(monkeypatch):
+    params = {'process_type': 'process3', 'output_format': 'csv'}
+    key = ResultCache.make_key(b"college code,total\n1,10\n", params)
+    assert ResultCache.make_key(b"college code,total\n1,10\n", params) == key
+    monkeypatch.setattr(result_cache, 'format_version', result_cache.format_version + 1)
+    assert ResultCache.make_key(b"college code,total\n1,10\n", params) != key
@@ -0,0 +1,117 @@
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from multiprocessing.connection import Client, Listener
+
+# Imported by every warm worker before its first task.
+warm_modules = ('numpy', 'pandas', 'loader', 'apportion', 'policy', 'pipeline', 'processing')
+
+
+@lru_cache(maxsize=32)
+def _compile(data):
+    from policy import Policy
+    return Policy.from_dict(json.loads(data))
+
+
+def compiled_policy(data):
+    """Policy.from_dict(data), kept per process so each policy is compiled once."""
+    # Keyed on the JSON in the order given: the order of the categories is
+    # the order of the output columns.
+    return _compile(json.dumps(data))
+
+
+def _warm(modules, policies):
+    for name in modules:
+        importlib.import_module(name)
+    for data in policies:
+        compiled_policy(data)
+
+
+def warm_pool(max_workers=None, modules=warm_modules, policies=()):
+    """A process pool whose workers are running and have imported ``modules`` and compiled ``policies``."""
+    max_workers = max_workers or os.cpu_count()
+    executor = ProcessPoolExecutor(max_workers, initializer=_warm,
+                                   initargs=(tuple(modules), [policy.to_dict() for policy in policies]))
+    for future in [executor.submit(os.getpid) for _ in range(max_workers)]:
+        future.result()
+    return executor
+
+
+def _address(address):
+    # host:port for TCP, anything else is a Unix socket path.
+    host, _, port = address.rpartition(':')
+    return (host, int(port)) if host and port.isdigit() else address
+
+
+def _authkey():
+    key = os.environ.get('SMAAT_WORKER_KEY')
+    if not key:
+        raise SystemExit("Set SMAAT_WORKER_KEY to the shared key of the worker server.")
+    return key.encode()
+
+
+def _run_batch(request, executor):
+    # batch.main with this server's pool, its output captured for the client.
+    from batch import main
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+        try:
+            os.chdir(request['cwd'])
+            code = main(request['argv'], executor=executor)
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else 1
+        except Exception as e:
+            print(f"Error: {e}")
+            code = 1
+    return {'code': code, 'output': output.getvalue()}
+
+
+def serve(address, max_workers=None):
+    """Keep a warm pool running and run the batches sent by ``submit``, one at a time."""
+    from policy import default_policy
+    max_workers = max_workers or os.cpu_count()
+    executor = warm_pool(max_workers, policies=[default_policy])
+    print(f"Worker server listening on {address} with {max_workers} warm workers")
+    try:
+        with Listener(_address(address), authkey=_authkey()) as listener:
+            while True:
+                with listener.accept() as connection:
+                    connection.send(_run_batch(connection.recv(), executor))
+    finally:
+        executor.shutdown()
+
+
+def submit(address, argv):
+    """Run ``batch.py argv`` on a worker server; the client itself never imports pandas."""
+    with Client(_address(address), authkey=_authkey()) as connection:
+        connection.send({'cwd': os.getcwd(), 'argv': list(argv)})
+        response = connection.recv()
+    sys.stdout.write(response['output'])
+    return response['code']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Persistent pre-warmed workers for batch.py.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    serve_parser = subparsers.add_parser('serve', help="start a worker server")
+    serve_parser.add_argument('address', help="Unix socket path or host:port")
+    serve_parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    submit_parser = subparsers.add_parser('submit', help="run a batch on a worker server")
+    submit_parser.add_argument('address', help="Unix socket path or host:port")
+    submit_parser.add_argument('batch_args', nargs=argparse.REMAINDER, help="arguments for batch.py")
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        serve(args.address, args.workers)
+        return 0
+    return submit(args.address, args.batch_args)
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())